@@ -0,0 +1,111 @@
+"""Micro-benchmark: regex_bank (một alternation/nhóm) so với vòng lặp re.search cũ.
+
+Chạy từ thư mục gốc của bot:
+    python -m benchmarks.bench_regex_bank [--corpus FILE] [--repeat N]
+
+Corpus mặc định là các tin nhắn đã thu thập trong data/collected (segment JSONL);
+nếu chưa có thì dùng benchmarks/sample_messages.txt. FILE có thể là .jsonl
+(trường "content") hoặc file text mỗi dòng một tin.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import timeit
+
+from core.regex_bank import ANSWER_PATTERNS, ANSWER_RE, QUESTION_PATTERNS, QUESTION_RE, ITEM_PATTERNS, TIME_PATTERNS
+
+SAMPLE_CORPUS = os.path.join(os.path.dirname(__file__), "sample_messages.txt")
+
+# Cách làm cũ của CaveStoreAI.extract_entities
+LEGACY_ITEM_PATTERNS = [
+    r'(sl|rp|silver lions|research points)',
+    r'(xe|vehicle|tank|plane)',
+    r'(premium|event)'
+]
+LEGACY_TIME_PATTERNS = [
+    r'(hôm nay|ngày mai|tuần sau|tháng sau)',
+    r'(\d+\s*(?:ngày|tuần|tháng|năm))',
+    r'(sáng|trưa|chiều|tối)'
+]
+
+def read_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                content = record.get("content") or record.get("message", {}).get("content")
+                if content:
+                    yield content
+            else:
+                yield line
+
+def load_corpus(path=None):
+    if path:
+        return list(read_file(path))
+    messages = []
+    for segment in sorted(glob.glob(os.path.join("data", "collected", "**", "*.jsonl"), recursive=True)):
+        messages.extend(read_file(segment))
+    return messages or list(read_file(SAMPLE_CORPUS))
+
+def legacy_classify(content):
+    content = content.lower().strip()
+    is_question = any(re.search(pattern, content) for pattern in QUESTION_PATTERNS)
+    is_answer = any(re.search(pattern, content) for pattern in ANSWER_PATTERNS)
+    return is_question, is_answer
+
+def bank_classify(content):
+    content = content.lower().strip()
+    return QUESTION_RE.search(content) is not None, ANSWER_RE.search(content) is not None
+
+def legacy_entities(message):
+    items, times = [], []
+    for pattern in LEGACY_ITEM_PATTERNS:
+        items.extend(match.group() for match in re.finditer(pattern, message, re.IGNORECASE))
+    for pattern in LEGACY_TIME_PATTERNS:
+        times.extend(match.group() for match in re.finditer(pattern, message, re.IGNORECASE))
+    return items, times
+
+def bank_entities(message):
+    items, times = [], []
+    for pattern in ITEM_PATTERNS:
+        items.extend(match.group() for match in pattern.finditer(message))
+    for pattern in TIME_PATTERNS:
+        times.extend(match.group() for match in pattern.finditer(message))
+    return items, times
+
+def bench(fn, corpus, repeat):
+    loop = lambda: [fn(message) for message in corpus]
+    return min(timeit.repeat(loop, number=1, repeat=repeat)) / len(corpus) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="file .jsonl hoặc .txt chứa tin nhắn")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        raise SystemExit("Corpus rỗng")
+
+    print(f"Corpus: {len(corpus)} tin nhắn")
+    # regex_bank phải cho đúng kết quả như cách cũ trước khi so tốc độ
+    for name, legacy, bank in (("phân loại", legacy_classify, bank_classify),
+                               ("thực thể", legacy_entities, bank_entities)):
+        mismatches = [m for m in corpus if legacy(m) != bank(m)]
+        assert not mismatches, f"{name} khác kết quả cũ: {mismatches[:5]}"
+    for name, legacy, bank in (("câu hỏi/trả lời", legacy_classify, bank_classify),
+                               ("thực thể", legacy_entities, bank_entities)):
+        before = bench(legacy, corpus, args.repeat)
+        after = bench(bank, corpus, args.repeat)
+        print(f"{name:16} cũ {before:7.2f} µs/tin   regex_bank {after:7.2f} µs/tin   x{before / after:.1f}")
+
+if __name__ == "__main__":
+    main()
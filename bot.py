@@ -9,7 +9,8 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from core.config import load_config
-from core.permissions import requires_role, ROLES
+from core.logger import setup_logging, log as _log
+from core.permissions import requires_role, ROLES, permission_index, update_role
 
 # Add current directory to Python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,12 +19,14 @@ if current_dir not in sys.path:
 
 # Load config
 config = load_config()
-GUILD_ID = int(config.get("GUILD_ID", "0"))
+GUILD_ID = config.get("GUILD_ID", 0)
 
-# Set up logging
-def log(message):
+# Set up logging (ghi file qua hàng đợi, không chặn event loop)
+setup_logging()
+
+def log(message, **fields):
     print(message)
-    logging.info(message)
+    _log(message, **fields)
 
 import os
 import sys
@@ -36,6 +39,8 @@ import psutil
 import discord
 from discord.ext import commands
 from core.ai_core import CaveStoreAI
+from core.notifier import NotificationDispatcher
+from core.user_cache import UserCache
 
 # Simple bot class focused on order management
 class CaveStoreBot(commands.Bot):
@@ -52,25 +57,26 @@ class CaveStoreBot(commands.Bot):
             max_messages=None  # Disable message cache
         )
         
-        # Setup logging
-        logging.basicConfig(
-            filename='log.txt',
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
+        # Logging đã được setup_logging() gắn vào root logger
         self.logger = logging.getLogger('CaveStoreBot')
         
-    def has_role(self, member: discord.Member, role_name: str) -> bool:
-        """Check if member has role"""
-        role_ids = ROLES.get(role_name, [])
-        return any(role.id in role_ids for role in member.roles)
+        # Cache user/kênh DM để hạn chế gọi REST fetch_user
+        self.user_cache = UserCache(self)
+        
+        # Hàng đợi gửi DM/thông báo kênh chạy nền
+        self.notifier = NotificationDispatcher(self, self.user_cache)
+        
+    async def close(self):
+        await self.notifier.stop()
+        await super().close()
+        
+    def has_role(self, member: discord.Member, role_name) -> bool:
+        """Check if member has role (one name or a list of names)"""
+        return permission_index.has(member, role_name)
 
     def get_permission_level(self, member: discord.Member) -> str:
         """Get highest permission level"""
-        if self.has_role(member, "ADMIN"): return "ADMIN"
-        if self.has_role(member, "MODERATOR"): return "MODERATOR"
-        if self.has_role(member, "WORKER"): return "WORKER"
-        return "ALL"
+        return permission_index.level(member)
 
 # Create bot instance
 bot = CaveStoreBot()
@@ -95,8 +101,9 @@ async def on_ready():
         # Notify admin channel
         try:
             home_guild = bot.get_guild(GUILD_ID)
-            if home_guild and config.get("ADMIN_CHANNEL_ID"):
-                admin_channel = home_guild.get_channel(int(config["ADMIN_CHANNEL_ID"]))
+            admin_channel_id = load_config().get("ADMIN_CHANNEL_ID")
+            if home_guild and admin_channel_id:
+                admin_channel = home_guild.get_channel(admin_channel_id)
                 if admin_channel:
                     embed = discord.Embed(
                         title="✅ Bot Ready",
@@ -129,6 +136,7 @@ async def on_ready():
 @bot.event
 async def setup_hook():
     try:
+        bot.notifier.start()
         log("[Setup] Loading extensions...")
         
         # Load extensions
@@ -233,7 +241,7 @@ async def update_role_permission(
                     f"❌ Role {role.name} already has {loai} permission",
                     ephemeral=True
                 )
-            role_ids.append(role.id)
+            update_role(loai, role.id, add=True)
             action_text = "added to"
         else:
             if role.id not in role_ids:
@@ -241,7 +249,7 @@ async def update_role_permission(
                     f"❌ Role {role.name} doesn't have {loai} permission",
                     ephemeral=True
                 )
-            role_ids.remove(role.id)
+            update_role(loai, role.id, add=False)
             action_text = "removed from"
 
         # Create response embed
@@ -269,6 +277,21 @@ async def update_role_permission(
             ephemeral=True
         )
 
+@bot.tree.command(name="taicauhinh", description="🔄 Reload config.json without restarting (Admin)")
+@app_commands.guild_only()
+@requires_role("ADMIN")
+async def reload_config(interaction: discord.Interaction):
+    """Nạp lại config.json ngay lập tức"""
+    from core.config import config_service
+    if config_service.reload():
+        log(f"[CONFIG] Reloaded by {interaction.user}")
+        await interaction.response.send_message("✅ Config reloaded", ephemeral=True)
+    else:
+        await interaction.response.send_message(
+            "❌ Could not reload config.json, keeping the current config",
+            ephemeral=True
+        )
+
 @bot.tree.command(name="thongbao", description="📢 Send announcement to all servers (Admin)")
 @app_commands.guild_only()
 @requires_role("ADMIN")
@@ -401,24 +424,24 @@ async def help_command(interaction: discord.Interaction):
 @bot.event
 async def on_guild_join(guild):
     """Event when bot joins a new server"""
-    log(f"[NEW SERVER] {guild.name} (ID: {guild.id})")
+    log(f"[NEW SERVER] {guild.name}", guild=guild.id)
     
     # Simple notification
     home_guild = bot.get_guild(GUILD_ID)
-    if home_guild and config.get("ADMIN_CHANNEL_ID"):
+    if home_guild and load_config().get("ADMIN_CHANNEL_ID"):
         embed = discord.Embed(
             title="✨ Server mới",
             description=f"**{guild.name}**\nID: `{guild.id}`",
             color=0x00ff00
         )
-        admin_channel = home_guild.get_channel(int(config["ADMIN_CHANNEL_ID"]))
+        admin_channel = home_guild.get_channel(load_config()["ADMIN_CHANNEL_ID"])
         if admin_channel:
             await admin_channel.send(embed=embed)
 
 @bot.event
 async def on_guild_remove(guild):
     """Event when bot is removed"""
-    log(f"[LEAVE] {guild.name} (ID: {guild.id})")
+    log(f"[LEAVE] {guild.name}", guild=guild.id)
 
 # Start bot
 log(">>> Starting bot...")
@@ -461,7 +484,7 @@ async def on_guild_join(guild):
         embed.add_field(name="Chủ server", value=f"{guild.owner.name} ({guild.owner.id})")
         
         # Gửi thông báo vào kênh admin
-        admin_channel = home_guild.get_channel(int(config["ADMIN_CHANNEL_ID"]))
+        admin_channel = home_guild.get_channel(load_config()["ADMIN_CHANNEL_ID"])
         if admin_channel:
             await admin_channel.send(embed=embed)
 
@@ -482,7 +505,7 @@ async def on_guild_remove(guild):
         embed.set_thumbnail(url=guild.icon.url if guild.icon else None)
         
         # Gửi thông báo vào kênh admin
-        admin_channel = home_guild.get_channel(int(config["ADMIN_CHANNEL_ID"]))
+        admin_channel = home_guild.get_channel(load_config()["ADMIN_CHANNEL_ID"])
         if admin_channel:
             await admin_channel.send(embed=embed)
 
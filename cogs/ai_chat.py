@@ -2,7 +2,11 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 from core.ai_handler import BotAI
-from core.data_collector import DataCollector
+from core.ai_executor import AIExecutor, AIExecutorBusy
+from core.config import load_config
+from core.data_collector import DataCollector, MessageRecord
+from core.ingestion import IngestionPipeline
+from core.message_analysis import MessageAnalyzer
 from core.web_collector import WebDataCollector
 from core.price_tracker import PriceTracker
 from core.price_predictor import PricePredictor
@@ -15,11 +19,22 @@ import asyncio
 import json
 import os
 
+# Token của interaction hết hạn sau 15 phút (chừa vài giây để gửi followup)
+INTERACTION_TTL = 15 * 60 - 5
+
 class AIChatCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.ai = BotAI()
         self.collector = DataCollector()  # Khởi tạo data collector
+        # Phân tích mỗi tin nhắn một lần, dùng chung cho collector và AI
+        self.analyzer = MessageAnalyzer(self.ai.nlp, self.collector)
+        self.ai.analyzer = self.analyzer
+        # on_message chỉ đẩy tin vào hàng đợi, việc thu thập chạy nền theo lô
+        self.ingestion = IngestionPipeline.from_config(self.collector, self.analyzer, load_config())
+        self.ingestion.start(self.bot.loop)
+        # Phân tích/tìm câu trả lời/học chạy trong thread pool, không chặn event loop
+        self.executor = AIExecutor.from_config(load_config())
         self.web_collector = WebDataCollector()  # Khởi tạo web collector
         self.price_tracker = PriceTracker(bot)  # Khởi tạo price tracker
         self.price_predictor = PricePredictor()  # Khởi tạo price predictor
@@ -196,12 +211,11 @@ class AIChatCommands(commands.Cog):
         if message.author.bot:
             return
             
-        # Thu thập dữ liệu từ tất cả tin nhắn (không chỉ trong chat channels)
-        self.collector.collect_message(message)
-            
         # Chỉ phản hồi trong kênh được kích hoạt hoặc khi được mention
         if (message.channel.id not in self.chat_channels and 
             self.bot.user not in message.mentions):
+            # Vẫn thu thập dữ liệu từ mọi tin nhắn; hàng đợi tự phân tích
+            self.ingestion.submit(MessageRecord.from_message(message))
             return
             
         # Xóa mention khỏi nội dung tin nhắn
@@ -211,7 +225,17 @@ class AIChatCommands(commands.Cog):
         content = content.strip()
         
         if not content:  # Nếu tin nhắn chỉ có mention
+            self.ingestion.submit(MessageRecord.from_message(message))
+            return
+            
+        # Phân tích một lần trong thread pool, dùng chung cho collector và AI
+        try:
+            analysis = await self.executor.run(self.analyzer.analyze, content)
+        except (AIExecutorBusy, asyncio.TimeoutError):
+            self.ingestion.submit(MessageRecord.from_message(message))
+            await message.reply("⏳ Bot đang bận, bạn thử lại sau ít phút nhé!")
             return
+        self.ingestion.submit(MessageRecord.from_message(message, analysis))
             
         # Bắt đầu typing để tạo cảm giác tự nhiên
         async with message.channel.typing():
@@ -224,7 +248,12 @@ class AIChatCommands(commands.Cog):
             }
             
             # Lấy câu trả lời từ AI
-            response, confidence = self.ai.find_best_response(content, context)
+            try:
+                response, confidence = await self.executor.run(
+                    self.ai.find_best_response, content, context, analysis)
+            except (AIExecutorBusy, asyncio.TimeoutError):
+                await message.reply("⏳ Bot đang bận, bạn thử lại sau ít phút nhé!")
+                return
             
             # Đợi một chút để tạo cảm giác tự nhiên
             await asyncio.sleep(1.5)
@@ -245,7 +274,7 @@ class AIChatCommands(commands.Cog):
             try:
                 reaction, user = await self.bot.wait_for('reaction_add', timeout=60.0, check=check)
                 if str(reaction.emoji) == '👍':
-                    self.ai.learn(content, response, context)
+                    await self.executor.run(self.ai.learn, content, response, context)
                     await sent_msg.add_reaction('📝')
             except:
                 pass
@@ -263,8 +292,18 @@ class AIChatCommands(commands.Cog):
             "timestamp": datetime.now().isoformat()
         }
         
-        # Lấy câu trả lời từ AI
-        response, confidence = self.ai.find_best_response(noi_dung, context)
+        # Lấy câu trả lời từ AI; việc còn trong hàng đợi bị huỷ khi interaction hết hạn
+        try:
+            response, confidence = await self.executor.run(
+                self.ai.find_best_response, noi_dung, context,
+                timeout=self._interaction_timeout(interaction))
+        except AIExecutorBusy:
+            await interaction.followup.send("⏳ Bot đang bận, bạn thử lại sau ít phút nhé!")
+            return
+        except asyncio.TimeoutError:
+            if self._interaction_timeout(interaction) > 0:
+                await interaction.followup.send("⏳ Bot xử lý quá lâu, bạn thử lại sau nhé!")
+            return
         
         # Tạo embed response
         embed = discord.Embed(
@@ -286,16 +325,31 @@ class AIChatCommands(commands.Cog):
         try:
             reply_msg = await self.bot.wait_for('message', timeout=60.0, check=check)
             if reply_msg.content.startswith(('👍', '✅', 'đúng', 'chính xác')):
-                self.ai.learn(noi_dung, response, context)
+                await self.executor.run(self.ai.learn, noi_dung, response, context)
                 await reply_msg.add_reaction('📝')
             elif reply_msg.content.startswith(('👎', '❌', 'sai')):
                 correct_response = reply_msg.content.replace('👎', '').replace('❌', '').replace('sai', '').strip()
                 if correct_response:
-                    self.ai.learn(noi_dung, correct_response, context)
+                    await self.executor.run(self.ai.learn, noi_dung, correct_response, context)
                     await reply_msg.add_reaction('📚')
         except:
             pass
 
+    def _interaction_timeout(self, interaction: discord.Interaction) -> float:
+        """Thời gian chờ AI: AI_EXECUTOR.timeout nhưng không quá lúc interaction hết hạn"""
+        age = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+        remaining = INTERACTION_TTL - age
+        if self.executor.timeout is None:
+            return remaining
+        return min(self.executor.timeout, remaining)
+
+    async def cog_unload(self):
+        """Ghi nốt dữ liệu AI chưa lưu khi gỡ cog/tắt bot"""
+        self.executor.shutdown()
+        await self.ingestion.stop()
+        await asyncio.to_thread(self.ai.flush)
+        await asyncio.to_thread(self.collector.save_data)
+
     def save_chat_channels(self):
         """Lưu danh sách kênh chat được kích hoạt"""
         data_dir = "data"
@@ -802,6 +856,7 @@ class AIChatCommands(commands.Cog):
     async def aistats(self, interaction: discord.Interaction):
         ai_stats = self.ai.get_stats()
         collector_stats = self.collector.get_stats()
+        ingestion_stats = self.ingestion.get_stats()
         
         embed = discord.Embed(
             title="📊 Thống kê Hệ thống AI",
@@ -827,7 +882,8 @@ class AIChatCommands(commands.Cog):
             value=(
                 f"• Tin nhắn: `{collector_stats['total_messages']}`\n"
                 f"• Cuộc hội thoại: `{collector_stats['total_conversations']}`\n"
-                f"• Cặp Q&A: `{collector_stats['total_qa_pairs']}`"
+                f"• Cặp Q&A: `{collector_stats['total_qa_pairs']}`\n"
+                f"• Đang chờ / bị bỏ (quá tải): `{ingestion_stats['queued']}` / `{ingestion_stats['dropped']}`"
             ),
             inline=False
         )
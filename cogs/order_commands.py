@@ -14,7 +14,8 @@ if parent_dir not in sys.path:
 # Now import from core as a package
 from core import orders, save_orders, generate_order_id, log
 from core.permissions import requires_role
-from core.time_utils import convert_to_local_time, format_time_remaining, format_deadline
+from core.deadline_scheduler import deadline_scheduler
+from core.time_utils import convert_to_local_time, format_time_remaining, format_deadline, from_timestamp
 
 class DonHang(discord.ui.Modal, title="Đặt đơn Cave Store"):
     def __init__(self):
@@ -70,9 +71,11 @@ class DonHang(discord.ui.Modal, title="Đặt đơn Cave Store"):
             "nguoi_nhan": None,
             "nguoi_nhan_id": None,
             "thoi_han": None,
+            "thoi_han_ts": None,
             
             # Thông tin thời gian
             "thoi_gian": now.strftime("%Y-%m-%d %H:%M:%S UTC"),
+            "thoi_gian_ts": now.timestamp(),
             "thoi_gian_local": local_time.strftime("%d/%m/%Y %H:%M:%S") + f" ({tz_name})",
             "server_order": interaction.guild.name if interaction.guild else "Direct Message",
             "server_id": str(interaction.guild.id) if interaction.guild else None,
@@ -81,7 +84,6 @@ class DonHang(discord.ui.Modal, title="Đặt đơn Cave Store"):
             "da_nhac_het_gio": False,
             "qua_han": False
         }
-        save_orders()
         embed = discord.Embed(title="📥 Đơn hàng mới", color=0x00ffcc)
         embed.add_field(name="Mã đơn", value=f"`{ma_don}`", inline=True)
         embed.add_field(name="Khách",      value=user.mention, inline=True)
@@ -94,12 +96,9 @@ class DonHang(discord.ui.Modal, title="Đặt đơn Cave Store"):
         # Import locally to avoid circular imports
         from core import load_config
         config = load_config()
-        for cid in (int(config["LOG_CHANNEL_ID"]), int(config["ADMIN_CHANNEL_ID"])):
-            ch = interaction.client.get_channel(cid)
-            if ch: 
-                await ch.send(embed=embed)
-            else:
-                log(f"⚠️ Không tìm thấy kênh {cid}")
+        notifier = interaction.client.notifier
+        for cid in (config["LOG_CHANNEL_ID"], config["ADMIN_CHANNEL_ID"]):
+            notifier.notify_channel(cid, embed=embed)
         
         # Tạo embed thông báo chi tiết cho khách hàng
         customer_embed = discord.Embed(
@@ -129,21 +128,12 @@ class DonHang(discord.ui.Modal, title="Đặt đơn Cave Store"):
         customer_embed.set_footer(text=f"Thời gian đặt: {local_time.strftime('%d/%m/%Y %H:%M:%S')} ({tz_name})")
 
         # Gửi thông báo cho khách hàng
-        try:
-            await user.send(embed=customer_embed)
-        except Exception as e:
-            log(f"⚠️ Không thể gửi DM cho khách hàng {user.id}: {str(e)}")
-            await interaction.response.send_message(
-                f"✅ Đã gửi đơn `{ma_don}`!\n"
-                "⚠️ Không thể gửi thông báo qua DM. Vui lòng bật DM để nhận thông báo.",
-                ephemeral=True
-            )
-        else:
-            await interaction.response.send_message(
-                f"✅ Đã gửi đơn `{ma_don}`!\n"
-                "📨 Chi tiết đơn hàng đã được gửi qua tin nhắn riêng.",
-                ephemeral=True
-            )
+        notifier.notify_user(user.id, embed=customer_embed)
+        await interaction.response.send_message(
+            f"✅ Đã gửi đơn `{ma_don}`!\n"
+            "📨 Chi tiết đơn hàng sẽ được gửi qua tin nhắn riêng (hãy bật DM để nhận thông báo).",
+            ephemeral=True
+        )
             
         log(f"[ĐƠN MỚI] {ma_don} từ {user}")
 
@@ -166,13 +156,9 @@ class OrderCommands(commands.Cog):
         if ma_don not in orders:
             return await interaction.response.send_message("❌ Không tìm thấy đơn.", ephemeral=True)
         orders[ma_don]["trang_thai"] = "✅ Đã duyệt"
-        save_orders()
-        try:
-            u = await self.bot.fetch_user(orders[ma_don]["user_id"])
-            await u.send(f"📢 Đơn `{ma_don}` đã được duyệt.")
-        except: 
-            log(f"⚠️ Không thể gửi DM cho user {orders[ma_don]['user_id']}")
-        log(f"[DUYỆT] {ma_don} bởi {interaction.user}")
+        save_orders(ma_don)
+        self.bot.notifier.notify_user(orders[ma_don]["user_id"], f"📢 Đơn `{ma_don}` đã được duyệt.")
+        log(f"[DUYỆT] bởi {interaction.user}", order_id=ma_don, guild=interaction.guild_id)
         await interaction.response.send_message(f"✅ Đã duyệt `{ma_don}`", ephemeral=True)
 
     @app_commands.command(name="trangthai", description="🔍 Xem trạng thái đơn")
@@ -217,16 +203,15 @@ class OrderCommands(commands.Cog):
             time_info = []
             if o.get("thoi_gian_local"):
                 time_info.append(f"⏰ Đặt lúc: {o['thoi_gian_local']}")
-            elif o.get("thoi_gian"):
-                utc_time = datetime.strptime(o["thoi_gian"], "%Y-%m-%d %H:%M:%S UTC").replace(tzinfo=timezone.utc)
-                local_time, tz_name = convert_to_local_time(utc_time)
+            elif o.get("thoi_gian_ts") is not None:
+                local_time, tz_name = convert_to_local_time(from_timestamp(o["thoi_gian_ts"]))
                 time_info.append(f"⏰ Đặt lúc: {local_time.strftime('%d/%m/%Y %H:%M:%S')} ({tz_name})")
             
             if time_info:
                 e.add_field(name="🕒 Thông tin thời gian", value="\n".join(time_info), inline=False)
             
-            if o.get("thoi_han"):
-                deadline = datetime.strptime(o["thoi_han"], "%Y-%m-%d %H:%M:%S UTC").replace(tzinfo=timezone.utc)
+            if o.get("thoi_han_ts") is not None:
+                deadline = from_timestamp(o["thoi_han_ts"])
                 local_time, tz_name = convert_to_local_time(deadline)
                 time_remaining = format_time_remaining(deadline)
                 e.add_field(
@@ -235,9 +220,8 @@ class OrderCommands(commands.Cog):
                     inline=False
                 )
             
-            if o.get("thoi_gian"):
-                order_time = datetime.strptime(o["thoi_gian"], "%Y-%m-%d %H:%M:%S UTC").replace(tzinfo=timezone.utc)
-                local_order_time, tz_name = convert_to_local_time(order_time)
+            if o.get("thoi_gian_ts") is not None:
+                local_order_time, tz_name = convert_to_local_time(from_timestamp(o["thoi_gian_ts"]))
                 e.set_footer(text=f"🕒 Đặt lúc: {local_order_time.strftime('%d/%m/%Y %H:%M')} ({tz_name})")
                 
             await interaction.response.send_message(embed=e, ephemeral=True)
@@ -253,8 +237,9 @@ class OrderCommands(commands.Cog):
             return await interaction.response.send_message("⛔ Không thể huỷ đơn của người khác.", ephemeral=True)
         if orders[ma_don]["trang_thai"] != "⏳ Chờ duyệt":
             return await interaction.response.send_message("❌ Đơn đã được duyệt, không thể huỷ.", ephemeral=True)
-        del orders[ma_don]; save_orders()
-        log(f"[HUỶ] {ma_don} bởi {interaction.user}")
+        del orders[ma_don]
+        deadline_scheduler.cancel(ma_don)
+        log(f"[HUỶ] bởi {interaction.user}", order_id=ma_don, guild=interaction.guild_id)
         await interaction.response.send_message(f"✅ Đã huỷ `{ma_don}`", ephemeral=True)
 
     @app_commands.command(name="nhancay", description="📥 Nhận đơn (chốt đơn)")
@@ -289,12 +274,14 @@ class OrderCommands(commands.Cog):
                 "nguoi_nhan_id": u.id,
                 "trang_thai": "🚀 Đang xử lý",
                 "thoi_han": han_chot_str,
+                "thoi_han_ts": deadline_dt.timestamp(),
                 "da_nhac_het_gio": False,
                 "qua_han": False
             })
             
             # Save changes
-            save_orders()
+            save_orders(ma_don)
+            deadline_scheduler.schedule(ma_don, orders[ma_don])
             log(f"[NHẬN] {ma_don} bởi {u.name}#{u.discriminator}")
             
             # Send success message with local time
@@ -306,7 +293,7 @@ class OrderCommands(commands.Cog):
             await interaction.followup.send(msg, ephemeral=True)
             
         except Exception as e:
-            log(f"[LỖI] Trong lệnh /nhancay: {e}")
+            log(f"[LỖI] Trong lệnh /nhancay: {e}", order_id=ma_don)
             await interaction.followup.send("🚨 Đã xảy ra lỗi khi nhận đơn.", ephemeral=True)
 
     @app_commands.command(name="hoanthanh", description="🎉 Đánh dấu hoàn thành")
@@ -317,8 +304,9 @@ class OrderCommands(commands.Cog):
         if orders[ma_don]["nguoi_nhan_id"] != interaction.user.id:
             return await interaction.response.send_message("⛔ Bạn không nhận đơn này.", ephemeral=True)
         orders[ma_don]["trang_thai"] = "✅ Đã hoàn thành"
-        save_orders()
-        log(f"[HOÀN THÀNH] {ma_don} bởi {interaction.user}")
+        save_orders(ma_don)
+        deadline_scheduler.cancel(ma_don)
+        log(f"[HOÀN THÀNH] bởi {interaction.user}", order_id=ma_don, guild=interaction.guild_id)
         await interaction.response.send_message(f"✅ Hoàn thành `{ma_don}`!", ephemeral=True)
 
     @app_commands.command(name="suadon", description="✏️ Chỉnh sửa ghi chú đơn")
@@ -328,12 +316,11 @@ class OrderCommands(commands.Cog):
         if ma_don not in orders:
             return await interaction.response.send_message("❌ Không tìm thấy.", ephemeral=True)
         # Still allow order owners to edit their own orders
-        if not self.bot.has_role(interaction.user, "ADMIN") and \
-           not self.bot.has_role(interaction.user, "MODERATOR") and \
+        if not self.bot.has_role(interaction.user, ["ADMIN", "MODERATOR"]) and \
            interaction.user.id != orders[ma_don]["user_id"]:
             return await interaction.response.send_message("⛔ Không có quyền.", ephemeral=True)
         orders[ma_don]["ghi_chu"] = ghichu
-        save_orders()
+        save_orders(ma_don)
         log(f"[SỬA] {ma_don} ghi chú -> {ghichu}")
         await interaction.response.send_message(f"✅ Đã cập nhật ghi chú cho `{ma_don}`", ephemeral=True)
 
@@ -343,8 +330,9 @@ class OrderCommands(commands.Cog):
     async def xoadon(self, interaction: discord.Interaction, ma_don: str):
         if ma_don not in orders:
             return await interaction.response.send_message("❌ Không tồn tại.", ephemeral=True)
-        del orders[ma_don]; save_orders()
-        log(f"[XOÁ] {ma_don} bởi {interaction.user}")
+        del orders[ma_don]
+        deadline_scheduler.cancel(ma_don)
+        log(f"[XOÁ] bởi {interaction.user}", order_id=ma_don, guild=interaction.guild_id)
         await interaction.response.send_message(f"🗑️ Đã xóa `{ma_don}`", ephemeral=True)
 
     @app_commands.command(name="giahan", description="🕒 Gia hạn thời gian cày")
@@ -357,18 +345,14 @@ class OrderCommands(commands.Cog):
         if not don.get("nguoi_nhan_id"):
             return await interaction.response.send_message("⚠️ Chưa nhận.", ephemeral=True)
         try:
-            # Lấy thời hạn cũ
-            deadline_str = don["thoi_han"]
-            if " UTC" not in deadline_str:
-                deadline_str += " UTC"
-            deadline = datetime.strptime(deadline_str, "%Y-%m-%d %H:%M:%S %Z").replace(tzinfo=timezone.utc)
-            
-            # Tính thời hạn mới
-            new_deadline = deadline + timedelta(minutes=so_phut)
+            # Tính thời hạn mới từ thời hạn cũ
+            new_deadline = from_timestamp(don["thoi_han_ts"]) + timedelta(minutes=so_phut)
             don["thoi_han"] = new_deadline.strftime("%Y-%m-%d %H:%M:%S UTC")
+            don["thoi_han_ts"] = new_deadline.timestamp()
             don["da_nhac_het_gio"] = False
             don["qua_han"] = False
-            save_orders()
+            save_orders(ma_don)
+            deadline_scheduler.schedule(ma_don, don)
             
             # Chuyển đổi sang giờ địa phương
             local_time, tz_name = convert_to_local_time(new_deadline)
@@ -395,19 +379,9 @@ class OrderCommands(commands.Cog):
             
             log(f"[GIA HẠN] {ma_don} +{so_phut}m -> {don['thoi_han']}")
             
-            # Gửi thông báo cho người nhận đơn
-            try:
-                worker = await self.bot.fetch_user(don["nguoi_nhan_id"])
-                await worker.send(embed=embed)
-            except:
-                log(f"[LỖI] Không thể gửi DM cho người nhận đơn {ma_don}")
-
-            # Gửi thông báo cho khách hàng
-            try:
-                customer = await self.bot.fetch_user(don["user_id"])
-                await customer.send(embed=embed)
-            except:
-                log(f"[LỖI] Không thể gửi DM cho khách hàng {don['user_id']}")
+            # Gửi thông báo cho người nhận đơn và khách hàng
+            self.bot.notifier.notify_user(don["nguoi_nhan_id"], embed=embed)
+            self.bot.notifier.notify_user(don["user_id"], embed=embed)
                 
             # Gửi thông báo thành công cho người dùng lệnh
             await interaction.response.send_message(
@@ -415,7 +389,7 @@ class OrderCommands(commands.Cog):
                 ephemeral=True
             )
         except Exception as e:
-            log(f"[ERR] giahan {ma_don}: {e}")
+            log(f"[ERR] giahan: {e}", order_id=ma_don)
             await interaction.response.send_message("❌ Lỗi khi gia hạn.", ephemeral=True)
 
     @app_commands.command(name="tinhgia", description="💰 Tính giá trị đơn hàng")
@@ -440,14 +414,18 @@ class OrderCommands(commands.Cog):
     @app_commands.command(name="thongke", description="📈 Thống kê đơn hàng")
     @requires_role(["ADMIN", "MODERATOR"])
     async def thongke(self, interaction: discord.Interaction):
-        done = sum(1 for o in orders.values() if o["trang_thai"]=="✅ Đã hoàn thành")
-        late = sum(1 for o in orders.values() if o["trang_thai"]=="⚠️ Quá hạn")
-        processing = sum(1 for o in orders.values() if o["trang_thai"]=="🚀 Đang xử lý")
+        counts = orders.count_by_status()
+        done = counts.get("✅ Đã hoàn thành", 0)
+        late = counts.get("⚠️ Quá hạn", 0)
+        processing = counts.get("🚀 Đang xử lý", 0)
+        cache_stats = self.bot.user_cache.get_stats()
         await interaction.response.send_message(
             f"📦 Tổng đơn: `{len(orders)}`\n"
             f"✅ Hoàn thành: `{done}`\n"
             f"🚀 Đang xử lý: `{processing}`\n"
-            f"⏰ Quá hạn: `{late}`",
+            f"⏰ Quá hạn: `{late}`\n"
+            f"👤 Cache user: `{cache_stats['hit_rate']*100:.1f}%` hit "
+            f"({cache_stats['misses']} miss, DM {cache_stats['dm_hits']}/{cache_stats['dm_misses']})",
             ephemeral=True
         )
 
@@ -456,14 +434,9 @@ class OrderCommands(commands.Cog):
     @requires_role(["ADMIN", "MODERATOR"])
     async def danhsachdon(self, interaction: discord.Interaction, trang_thai: str = None):
         try:
-            filtered = []
-            for mid, o in orders.items():
-                if trang_thai is None or o['trang_thai'] == trang_thai:
-                    filtered.append((mid, o))
+            filtered = orders.list_orders(trang_thai, limit=10)
             if not filtered:
                 return await interaction.response.send_message("❌ Không có đơn nào phù hợp", ephemeral=True)
-            filtered.sort(key=lambda x: x[1]['thoi_gian'], reverse=True)
-            filtered = filtered[:10]
             embed = discord.Embed(title="📋 Danh sách đơn hàng", color=0x3498db)
             for mid, o in filtered:
                 status = o['trang_thai']
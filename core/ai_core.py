@@ -1,7 +1,6 @@
 from typing import Dict, List, Optional, Tuple, Any
 import random
-import re
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import json
 import os
 import logging
@@ -12,6 +11,10 @@ import matplotlib.pyplot as plt
 import io
 from collections import defaultdict
 from functools import lru_cache
+from .keyword_automaton import keyword_automaton
+from .orders import orders
+from .regex_bank import (CURRENCY_RE, ITEM_PATTERNS, NUMBER_RE, ORDER_ID_RE, ORDER_ITEM_RE,
+                         ORDER_QUANTITY_RE, TIME_PATTERNS)
 
 class CaveStoreAI:
     def __init__(self, bot):
@@ -25,7 +28,6 @@ class CaveStoreAI:
         
         # Core data với chức năng tích hợp
         self.core_data = {
-            'orders': {},        # Đơn hàng đang xử lý
             'prices': {},        # Bảng giá cơ bản
             'permissions': {},    # Cache quyền hạn
             'status': {}         # Trạng thái đơn hàng
@@ -109,6 +111,32 @@ class CaveStoreAI:
             }
         }
         
+        # Bảng từ khóa cho intent/phong cách/sentiment, quét chung một lượt
+        self.core_intents = {
+            'price': ['giá', 'báo giá', 'bao nhiêu', 'tính'],
+            'order': ['đặt', 'mua', 'order', 'book'],
+            'status': ['trạng thái', 'tình trạng', 'kiểm tra', 'check'],
+            'help': ['help', 'giúp', 'hd', 'hướng dẫn']
+        }
+        self.style_keywords = {
+            'formal': ['xin', 'vui lòng', 'cảm ơn', 'kính', 'thưa'],
+            'casual': ['hey', 'hi', 'ê', 'ơi', 'nhé', 'nha'],
+            'negative': ['không', 'chán', 'buồn', 'khó', 'tệ']
+        }
+        self.sentiment_keywords = {
+            'positive': [
+                'tốt', 'hay', 'thích', 'được', 'ok', 'ổn',
+                'cảm ơn', 'vui', 'giỏi', 'tuyệt'
+            ],
+            'negative': [
+                'không', 'chán', 'buồn', 'khó', 'tệ', 'kém',
+                'sai', 'lỗi', 'chậm', 'đắt'
+            ]
+        }
+        keyword_automaton.register("caveai.intent", self.core_intents)
+        keyword_automaton.register("caveai.style", self.style_keywords)
+        keyword_automaton.register("caveai.sentiment", self.sentiment_keywords)
+        
         # Initialize
         self.setup_logger()
         self.load_data()
@@ -134,15 +162,10 @@ class CaveStoreAI:
                 'rp': {'base': 200000, 'min': 100000},
                 'premium': {'base': 500000, 'min': 300000}
             }
-            
-            # Load trạng thái đơn hàng
-            if os.path.exists('orders.json'):
-                with open('orders.json', 'r', encoding='utf-8') as f:
-                    self.core_data['orders'] = json.load(f)
+            # Đơn hàng dùng chung core.orders.orders (cùng kho với các lệnh đơn hàng)
                     
         except Exception as e:
             print(f"Lỗi khi load dữ liệu: {e}")
-            self.core_data['orders'] = {}
 
     def analyze_context(self, message: str, user_id: str, additional_data: Dict = None) -> Dict:
         """Phân tích context của tin nhắn"""
@@ -178,12 +201,12 @@ class CaveStoreAI:
         }
         
         # Tìm items
-        items = re.findall(r'(sl|rp|premium|vehicle|tank|plane)', message.lower())
+        items = ORDER_ITEM_RE.findall(message.lower())
         if items:
             data['items'] = items
             
         # Tìm số lượng
-        qty = re.findall(r'(\d+)\s*(cái|individual|item|cai)', message.lower())
+        qty = ORDER_QUANTITY_RE.findall(message.lower())
         if qty:
             data['quantity'] = int(qty[0][0])
             
@@ -192,7 +215,7 @@ class CaveStoreAI:
             data['urgent'] = True
             
         # Tìm mã đơn
-        order_id = re.findall(r'[A-Z0-9]{8}', message)
+        order_id = ORDER_ID_RE.findall(message)
         if order_id:
             data['order_id'] = order_id[0]
             
@@ -200,18 +223,14 @@ class CaveStoreAI:
 
     def analyze_style(self, message: str) -> str:
         """Phân tích phong cách"""
-        message = message.lower()
+        scan = keyword_automaton.scan(message)
         
         # Formal indicators
-        formal_words = ['xin', 'vui lòng', 'cảm ơn', 'kính', 'thưa']
-        casual_words = ['hey', 'hi', 'ê', 'ơi', 'nhé', 'nha']
-        
-        formal_count = sum(word in message for word in formal_words)
-        casual_count = sum(word in message for word in casual_words)
+        formal_count = scan.count("caveai.style", "formal")
+        casual_count = scan.count("caveai.style", "casual")
         
         # Sentiment check
-        negative_words = ['không', 'chán', 'buồn', 'khó', 'tệ']
-        negative_count = sum(word in message for word in negative_words)
+        negative_count = scan.count("caveai.style", "negative")
         
         if formal_count > casual_count:
             return 'formal'
@@ -222,22 +241,9 @@ class CaveStoreAI:
 
     def detect_intent(self, message: str) -> str:
         """Phát hiện ý định của người dùng - phiên bản tối giản"""
-        message = message.lower()
-        
-        # Chỉ giữ lại các intent chính
-        core_intents = {
-            'price': ['giá', 'báo giá', 'bao nhiêu', 'tính'],
-            'order': ['đặt', 'mua', 'order', 'book'],
-            'status': ['trạng thái', 'tình trạng', 'kiểm tra', 'check'],
-            'help': ['help', 'giúp', 'hd', 'hướng dẫn']
-        }
-        
-        # Kiểm tra từng intent
-        for intent, patterns in core_intents.items():
-            if any(pattern in message for pattern in patterns):
-                return intent
-                
-        return 'general'
+        # Chỉ giữ lại các intent chính (self.core_intents), lấy intent đầu tiên khớp
+        intents = keyword_automaton.scan(message).categories("caveai.intent")
+        return intents[0] if intents else 'general'
 
     def extract_entities(self, message: str) -> Dict:
         """Trích xuất thông tin quan trọng"""
@@ -249,60 +255,33 @@ class CaveStoreAI:
         }
         
         # Extract items
-        item_patterns = [
-            r'(?i)(sl|rp|silver lions|research points)',
-            r'(?i)(xe|vehicle|tank|plane)',
-            r'(?i)(premium|event)'
-        ]
-        
-        for pattern in item_patterns:
-            matches = re.finditer(pattern, message, re.IGNORECASE)
-            entities['items'].extend(match.group() for match in matches)
+        for pattern in ITEM_PATTERNS:
+            entities['items'].extend(match.group() for match in pattern.finditer(message))
             
         # Extract numbers
-        number_pattern = r'\d+(?:,\d{3})*(?:\.\d+)?'
         entities['numbers'] = [
             float(num.replace(',', ''))
-            for num in re.findall(number_pattern, message)
+            for num in NUMBER_RE.findall(message)
         ]
         
         # Extract currency
-        currency_pattern = r'(?i)(vnd|đồng|vnđ|\$|usd)'
-        currency_match = re.search(currency_pattern, message)
+        currency_match = CURRENCY_RE.search(message)
         if currency_match:
             entities['currency'] = currency_match.group().upper()
             
         # Extract time expressions
-        time_patterns = [
-            r'(?i)(hôm nay|ngày mai|tuần sau|tháng sau)',
-            r'(?i)(\d+\s*(?:ngày|tuần|tháng|năm))',
-            r'(?i)(sáng|trưa|chiều|tối)'
-        ]
-        
-        for pattern in time_patterns:
-            matches = re.finditer(pattern, message, re.IGNORECASE)
-            entities['time_expressions'].extend(match.group() for match in matches)
+        for pattern in TIME_PATTERNS:
+            entities['time_expressions'].extend(match.group() for match in pattern.finditer(message))
             
         return entities
 
     def analyze_sentiment(self, message: str) -> Dict:
         """Phân tích sentiment"""
-        message = message.lower()
-        
-        # Sentiment dictionaries
-        positive_words = [
-            'tốt', 'hay', 'thích', 'được', 'ok', 'ổn',
-            'cảm ơn', 'vui', 'giỏi', 'tuyệt'
-        ]
-        
-        negative_words = [
-            'không', 'chán', 'buồn', 'khó', 'tệ', 'kém',
-            'sai', 'lỗi', 'chậm', 'đắt'
-        ]
+        scan = keyword_automaton.scan(message)
         
         # Calculate scores
-        pos_score = sum(word in message for word in positive_words)
-        neg_score = sum(word in message for word in negative_words)
+        pos_score = scan.count("caveai.sentiment", "positive")
+        neg_score = scan.count("caveai.sentiment", "negative")
         
         total = pos_score + neg_score
         if total == 0:
@@ -351,23 +330,31 @@ class CaveStoreAI:
         if not order_data.get('items'):
             return "Vui lòng cho biết bạn muốn đặt gì?"
             
-        # Tạo đơn hàng mới
+        # Tạo đơn hàng mới theo cùng định dạng với /donhang để các lệnh đơn hàng đọc được
         order_id = self._generate_order_id()
+        now = datetime.now(timezone.utc)
         order = {
-            'id': order_id,
+            'user': context.get('user_name') or str(user_id),
             'user_id': user_id,
-            'items': order_data['items'],
-            'quantity': order_data['quantity'],
-            'urgent': order_data['urgent'],
-            'status': 'pending',
-            'created_at': time.time()
+            'hinh_thuc': ", ".join(item.upper() for item in order_data['items']),
+            'loai': "",
+            'so_luong': str(order_data['quantity']),
+            'ghi_chu': "Đơn gấp (đặt qua chat AI)" if order_data['urgent'] else "Đặt qua chat AI",
+            'trang_thai': "⏳ Chờ duyệt",
+            'nguoi_nhan': None,
+            'nguoi_nhan_id': None,
+            'thoi_han': None,
+            'thoi_han_ts': None,
+            'thoi_gian': now.strftime("%Y-%m-%d %H:%M:%S UTC"),
+            'thoi_gian_ts': now.timestamp(),
+            'da_nhac_het_gio': False,
+            'qua_han': False
         }
         
-        # Lưu đơn hàng
-        self.core_data['orders'][order_id] = order
-        self._save_orders()
+        # Lưu đơn hàng (OrderStore tự ghi xuống backend)
+        orders[order_id] = order
         
-        return f"Đã tạo đơn hàng {order_id}. Tổng giá tạm tính: {self._calculate_price(order):,}đ"
+        return f"Đã tạo đơn hàng {order_id}. Tổng giá tạm tính: {self._calculate_price(order_data):,}đ"
         
     def _handle_price_check(self, context: Dict) -> str:
         """Xử lý yêu cầu check giá"""
@@ -397,30 +384,29 @@ class CaveStoreAI:
         # Nếu có mã đơn cụ thể
         if order_data.get('order_id'):
             order_id = order_data['order_id']
-            if order_id in self.core_data['orders']:
-                order = self.core_data['orders'][order_id]
-                return f"Đơn hàng {order_id}:\nTrạng thái: {order['status']}\nThời gian: {self._format_time(order['created_at'])}"
+            if order_id in orders:
+                order = orders[order_id]
+                return f"Đơn hàng {order_id}:\nTrạng thái: {order['trang_thai']}\nThời gian: {order['thoi_gian']}"
             return f"Không tìm thấy đơn hàng {order_id}"
             
-        # Liệt kê đơn của user
-        user_orders = [order for order in self.core_data['orders'].values()
-                      if order['user_id'] == user_id]
+        # Liệt kê đơn của user (truy vấn theo chỉ mục user_id của OrderStore)
+        user_orders = orders.by_user(user_id)
                       
         if not user_orders:
             return "Bạn chưa có đơn hàng nào"
             
-        recent = sorted(user_orders, key=lambda x: x['created_at'], reverse=True)[:3]
+        recent = sorted(user_orders, key=lambda item: item[1].get('thoi_gian_ts') or 0, reverse=True)[:3]
         return "Đơn hàng gần đây:\n" + "\n".join(
-            f"{order['id']}: {order['status']} ({self._format_time(order['created_at'])})"
-            for order in recent
+            f"{order_id}: {order['trang_thai']} ({order['thoi_gian']})"
+            for order_id, order in recent
         )
-        
+
     def _generate_order_id(self) -> str:
         """Tạo mã đơn hàng mới"""
         import random, string
         while True:
             order_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-            if order_id not in self.core_data['orders']:
+            if order_id not in orders:
                 return order_id
 
     def _format_with_style(self, response: str, style: str, context: Dict) -> str:
@@ -477,20 +463,6 @@ class CaveStoreAI:
             
         return int(total)
         
-    def _format_time(self, timestamp: float) -> str:
-        """Format thời gian"""
-        from datetime import datetime
-        dt = datetime.fromtimestamp(timestamp)
-        return dt.strftime("%d/%m/%Y %H:%M")
-        
-    def _save_orders(self):
-        """Lưu đơn hàng xuống file"""
-        try:
-            with open('orders.json', 'w', encoding='utf-8') as f:
-                json.dump(self.core_data['orders'], f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Lỗi khi lưu orders: {e}")
-            
     def analyze_market_trends(self, item: str) -> Dict:
         """Phân tích xu hướng đơn giản"""
         if item not in self.core_data['prices']:
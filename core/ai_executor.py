@@ -0,0 +1,83 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+class AIExecutorBusy(Exception):
+    """Hàng đợi của AIExecutor đã đầy"""
+
+class AIExecutor:
+    """Chạy việc AI nặng CPU (phân tích NLP, tìm câu trả lời, học) ngoài event loop.
+
+    Số việc đang chờ + đang chạy bị giới hạn bởi `max_pending`; vượt quá thì
+    run() ném AIExecutorBusy ngay thay vì xếp hàng vô hạn. Hết `timeout` (hoặc
+    coroutine gọi bị huỷ) thì việc còn nằm trong hàng đợi được huỷ luôn; việc
+    đã bắt đầu chạy thì chạy nốt nhưng kết quả bị bỏ.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32,
+                 timeout: Optional[float] = 10.0):
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.rejected = 0
+        self.timed_out = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai")
+
+    @classmethod
+    def from_config(cls, config) -> "AIExecutor":
+        """Đọc AI_EXECUTOR {"workers", "max_pending", "timeout"} từ config"""
+        settings = config.get("AI_EXECUTOR", {})
+        return cls(settings.get("workers", 2), settings.get("max_pending", 32),
+                   settings.get("timeout", 10.0))
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Chạy fn(*args, **kwargs) trong pool và chờ kết quả.
+
+        timeout=None dùng self.timeout; ném AIExecutorBusy khi hàng đợi đầy và
+        asyncio.TimeoutError khi quá hạn.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if timeout is not None and timeout <= 0:
+            self.timed_out += 1
+            raise asyncio.TimeoutError()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise AIExecutorBusy(f"AI đang xử lý {self._pending} yêu cầu")
+            self._pending += 1
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        # Slot chỉ được trả khi việc thực sự xong hoặc bị huỷ trước khi chạy
+        future.add_done_callback(self._release)
+        try:
+            # Huỷ wrapper (timeout/cancel) sẽ huỷ luôn future nếu nó chưa chạy
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+
+    def get_stats(self) -> dict:
+        return {
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+    def shutdown(self):
+        """Huỷ các việc đang chờ, không đợi việc đang chạy"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
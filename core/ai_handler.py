@@ -1,19 +1,44 @@
 import json
 import os
+import threading
 from datetime import datetime
 import random
-from typing import Dict, List, Tuple
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from .ai_patterns import get_all_patterns  # Import patterns mới
 from .nlp_processor import NLPProcessor  # Import NLP processor
+from .pattern_matcher import PatternMatcher
+from .message_analysis import MessageAnalysis, MessageAnalyzer
+from .sparse_matrix import SparseSetMatrix
+from .rate_limiter import LearnRateLimiter
+from .config import load_config
+from .persistence import DebouncedWriter
 
 class BotAI:
+    # Khoá trong bot_memory.json chứa trạng thái LearnRateLimiter
+    LIMITER_KEY = "learn_rate_limit"
+
     def __init__(self):
         self.data_file = "data/bot_memory.json"
         self.interactions = self.load_data()
         self.keywords = {}
         
+        # Khoá cho mọi thay đổi trên self.interactions (thread ghi file đọc snapshot dưới khoá này)
+        self._lock = threading.RLock()
+        config = load_config()
+        self._writer = DebouncedWriter(self.data_file, self._serialize,
+                                       interval=config.get("AI_SAVE_INTERVAL", 5.0))
+        
+        # Giới hạn số lần học (mặc định 10 lần/phút, cấu hình thêm theo user/guild),
+        # trạng thái được lưu cùng bot_memory.json để không reset khi khởi động lại
+        self.learn_limiter = LearnRateLimiter.from_config(config)
+        self.learn_limiter.load_state(self.interactions.pop(self.LIMITER_KEY, {}))
+        
         # Khởi tạo NLP processor
         self.nlp = NLPProcessor()
+        # Cog có thể thay bằng analyzer dùng chung với DataCollector
+        self.analyzer = MessageAnalyzer(self.nlp)
         
         # Load sẵn patterns từ file
         self.predefined_patterns = get_all_patterns()
@@ -22,8 +47,10 @@ class BotAI:
         if "patterns" not in self.interactions:
             self.interactions["patterns"] = {}
         self.interactions["patterns"].update(self.predefined_patterns)
+        self.pattern_matcher = PatternMatcher(self.interactions["patterns"])
         
         self.build_keywords()
+        self.build_index()
     
     def load_data(self) -> Dict:
         """Tải dữ liệu từ file"""
@@ -35,153 +62,248 @@ class BotAI:
                 return {"interactions": [], "patterns": {}}
         return {"interactions": [], "patterns": {}}
 
+    def _serialize(self) -> str:
+        with self._lock:
+            data = dict(self.interactions)
+            data[self.LIMITER_KEY] = self.learn_limiter.state()
+            return json.dumps(data, ensure_ascii=False, indent=2)
+
     def save_data(self):
-        """Lưu dữ liệu vào file"""
-        try:
-            os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.interactions, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Save Data Error: {str(e)}")
-            # Backup data to temporary file
-            try:
-                backup_file = f"{self.data_file}.backup"
-                with open(backup_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.interactions, f, ensure_ascii=False, indent=2)
-            except:
-                print("Failed to create backup file")
+        """Đánh dấu cần lưu; thread nền gộp các lần lưu liên tiếp thành một lần ghi"""
+        self._writer.mark_dirty()
+
+    def flush(self):
+        """Ghi ngay dữ liệu chưa lưu (khi tắt bot/unload cog)"""
+        self._writer.flush()
+
+    # Giới hạn số lượng tương tác để tránh quá tải
+    KEYWORD_WINDOW = 1000
+    # Giới hạn số responses cho mỗi keyword
+    KEYWORD_CAP = 100
 
     def build_keywords(self):
         """Xây dựng từ điển keywords từ các tương tác"""
         self.keywords = {}
-        # Giới hạn số lượng tương tác để tránh quá tải
-        max_interactions = 1000
-        recent_interactions = self.interactions.get("interactions", [])[-max_interactions:]
-        
-        for interaction in recent_interactions:
-            words = interaction["input"].lower().split()
-            for word in words:
-                if word not in self.keywords:
-                    self.keywords[word] = []
-                if len(self.keywords[word]) < 100:  # Giới hạn số responses cho mỗi keyword
-                    self.keywords[word].append(interaction["output"])
+        # Mọi response của từng keyword trong cửa sổ; keywords[word] là KEYWORD_CAP cái đầu
+        self._keyword_postings: Dict[str, deque] = {}
+        self._keyword_window: deque = deque()
+        for interaction in self.interactions.get("interactions", [])[-self.KEYWORD_WINDOW:]:
+            self._add_keywords(interaction)
+
+    def _add_keywords(self, interaction: Dict):
+        """Thêm keywords của một tương tác, đẩy tương tác cũ nhất ra khỏi cửa sổ"""
+        words = interaction["input"].lower().split()
+        output = interaction["output"]
+        self._keyword_window.append(words)
+        for word in words:
+            postings = self._keyword_postings.setdefault(word, deque())
+            postings.append(output)
+            responses = self.keywords.setdefault(word, [])
+            if len(responses) < self.KEYWORD_CAP:
+                responses.append(output)
+        if len(self._keyword_window) > self.KEYWORD_WINDOW:
+            self._evict_keywords(self._keyword_window.popleft())
+
+    def _evict_keywords(self, words: List[str]):
+        # Tương tác cũ nhất luôn đứng đầu postings của từng word
+        for word in words:
+            postings = self._keyword_postings[word]
+            postings.popleft()
+            responses = self.keywords[word]
+            responses.pop(0)
+            if len(postings) >= self.KEYWORD_CAP:
+                responses.append(postings[self.KEYWORD_CAP - 1])
+            if not postings:
+                del self._keyword_postings[word]
+                del self.keywords[word]
+
+    def _analyze_input(self, input_text: str) -> Dict:
+        """Phân tích NLP một lần để lưu kèm tương tác"""
+        analysis = self.analyzer.analyze(input_text)
+        return {"intent": analysis.intent, "entities": list(analysis.entities), "emotion": analysis.emotion}
+
+    def _index_interaction(self, idx: int, interaction: Dict):
+        nlp_data = interaction["nlp_data"]
+        self._token_matrix.add_row(interaction["input"].lower().split())
+        self._entity_matrix.add_row(nlp_data.get("entities") or ())
+        # Mã hoá intent thành số để so khớp cả mảng; thiếu intent thì không bao giờ khớp
+        intent_id = -1
+        if "intent" in nlp_data:
+            intent_id = self._intent_ids.setdefault(nlp_data["intent"], len(self._intent_ids))
+        if idx >= len(self._intents):
+            self._intents = np.resize(self._intents, max(64, len(self._intents) * 2))
+            for key, column in self._context_columns.items():
+                self._context_columns[key] = self._grow_column(column, len(self._intents))
+        self._intents[idx] = intent_id
+        # Mỗi khoá context là một cột mã số (-1 = tương tác không có khoá này)
+        context = interaction.get("context") or {}
+        for key, column in self._context_columns.items():
+            if key not in context:
+                column[idx] = -1
+        for key, value in context.items():
+            try:
+                codes = self._context_codes.setdefault(key, {})
+                code = codes.setdefault(value, len(codes))
+            except TypeError:
+                continue
+            column = self._context_columns.get(key)
+            if column is None:
+                column = self._context_columns[key] = np.full(len(self._intents), -1, dtype=np.int32)
+            column[idx] = code
+
+    @staticmethod
+    def _grow_column(column: np.ndarray, size: int) -> np.ndarray:
+        grown = np.full(size, -1, dtype=column.dtype)
+        grown[:len(column)] = column
+        return grown
+
+    def build_index(self):
+        """Xây dựng ma trận token/entity (dạng postings) và mảng intent của các tương tác"""
+        self._token_matrix = SparseSetMatrix()
+        self._entity_matrix = SparseSetMatrix()
+        self._intent_ids: Dict[Optional[str], int] = {}
+        self._intents = np.zeros(64, dtype=np.int32)
+        self._context_codes: Dict[str, Dict] = {}
+        self._context_columns: Dict[str, np.ndarray] = {}
+        backfilled = False
+        for idx, interaction in enumerate(self.interactions.get("interactions", [])):
+            # Tương tác cũ chưa có nlp_data: phân tích một lần rồi lưu lại
+            if not isinstance(interaction.get("nlp_data"), dict):
+                interaction["nlp_data"] = self._analyze_input(interaction["input"])
+                backfilled = True
+            self._index_interaction(idx, interaction)
+        if backfilled:
+            self.save_data()
+
+    def _snapshot_index(self, analysis: MessageAnalysis, context: Dict = None) -> Tuple:
+        """Chụp phần chỉ mục cần cho câu hỏi (gọi dưới self._lock).
+
+        Chỉ lấy view/tham chiếu, không chép dữ liệu: hàng đã đánh chỉ mục không bao
+        giờ bị sửa (learn() chỉ ghi thêm hàng mới hoặc thay mảng khi nới rộng) nên
+        _score_interactions() chạy được ngoài khoá.
+        """
+        context_codes = []
+        for key, value in (context or {}).items():
+            try:
+                code = self._context_codes.get(key, {}).get(value)
+            except TypeError:
+                continue
+            if code is not None:
+                context_codes.append((self._context_columns[key], code))
+        return (self._token_matrix.query(analysis.tokens),
+                self._entity_matrix.query(analysis.entities),
+                self._intents, self._intent_ids.get(analysis.intent, -2), context_codes)
+
+    @staticmethod
+    def _score_interactions(snapshot: Tuple) -> Tuple[Optional[int], float]:
+        """Chấm điểm mọi tương tác có chung token/entity với câu hỏi bằng NumPy.
+
+        Điểm = similarity*0.6 + intent*0.2 + entity*0.2 + 0.1 cho mỗi context trùng;
+        trả về (vị trí tương tác tốt nhất, điểm), bằng điểm thì lấy tương tác cũ hơn.
+        """
+        token_query, entity_query, intents, intent_id, context_codes = snapshot
+        token_rows, similarity = SparseSetMatrix.jaccard_from(token_query)
+        entity_rows, entity_score = SparseSetMatrix.jaccard_from(entity_query)
+        rows = np.union1d(token_rows, entity_rows)
+        if not len(rows):
+            return None, 0.0
+
+        sim = np.zeros(len(rows))
+        sim[np.searchsorted(rows, token_rows)] = similarity
+        ent = np.zeros(len(rows))
+        ent[np.searchsorted(rows, entity_rows)] = entity_score
+        intent_match = intents[rows] == intent_id
+
+        scores = sim * 0.6
+        scores = scores + np.where(intent_match, 0.2, 0.0)
+        scores = scores + ent * 0.2
+
+        if context_codes:
+            # Số khoá context trùng, so khớp theo cột mã số cho cả mảng ứng viên
+            matching_context = np.zeros(len(rows))
+            for column, code in context_codes:
+                matching_context += column[rows] == code
+            scores = scores + matching_context * 0.1
+
+        # rows tăng dần nên argmax (lấy vị trí đầu tiên) chọn tương tác cũ hơn khi bằng điểm
+        best = int(np.argmax(scores))
+        if scores[best] <= 0:
+            return None, 0.0
+        return int(rows[best]), float(scores[best])
 
     def learn(self, input_text: str, output_text: str, context: Dict = None):
         """Học từ tương tác mới với phân tích NLP"""
+        with self._lock:
+            self._learn(input_text, output_text, context)
+
+    def _learn(self, input_text: str, output_text: str, context: Dict = None):
         if "interactions" not in self.interactions:
             self.interactions["interactions"] = []
             
-        # Rate limiting: kiểm tra số lượng học trong 1 phút
-        current_time = datetime.now()
-        recent_learnings = [
-            i for i in self.interactions.get("interactions", [])
-            if (current_time - datetime.fromisoformat(i["timestamp"])).total_seconds() < 60
-        ]
-        if len(recent_learnings) >= 10:  # Giới hạn 10 lần học/phút
+        # Rate limiting: cửa sổ trượt theo toàn cục/user/guild
+        context = context or {}
+        if not self.learn_limiter.try_acquire(context.get("user_id"), context.get("guild_id")):
             print("Rate limit exceeded for learning")
             return
             
-        try:
-            # Phân tích NLP cho input
-            intent, entities = self.nlp.analyze(input_text)
-            emotion = self.nlp.detect_emotion(input_text)
-        except Exception as e:
-            print(f"Learning NLP Error: {str(e)}")
-            intent, entities = None, []
-            emotion = None
+        # Phân tích NLP cho input
+        nlp_data = self._analyze_input(input_text)
         
         interaction = {
             "timestamp": datetime.now().isoformat(),
             "input": input_text,
             "output": output_text,
             "context": context or {},
-            "nlp_data": {
-                "intent": intent,
-                "entities": entities,
-                "emotion": emotion
-            }
+            "nlp_data": nlp_data
         }
         
         self.interactions["interactions"].append(interaction)
+        self._index_interaction(len(self.interactions["interactions"]) - 1, interaction)
         
         # Cập nhật model NLP nếu cần
-        self.nlp.update_model(input_text, output_text, intent, entities)
+        self.nlp.update_model(input_text, output_text, nlp_data["intent"], nlp_data["entities"])
         
         self.save_data()
-        self.build_keywords()
+        self._add_keywords(interaction)
 
-    def find_best_response(self, input_text: str, context: Dict = None) -> Tuple[str, float]:
+    def find_best_response(self, input_text: str, context: Dict = None,
+                           analysis: MessageAnalysis = None) -> Tuple[str, float]:
         """Tìm câu trả lời phù hợp nhất sử dụng NLP và pattern matching"""
-        try:
-            # Phân tích NLP
-            intent, entities = self.nlp.analyze(input_text)
-            emotion = self.nlp.detect_emotion(input_text)
-        except Exception as e:
-            print(f"NLP Error: {str(e)}")
-            intent, entities = None, []
-            emotion = None
+        # Phân tích NLP (dùng lại kết quả của cog nếu đã có); analyzer tự đồng bộ cache
+        if analysis is None or analysis.text != input_text:
+            analysis = self.analyzer.analyze(input_text)
+        intent, entities, emotion = analysis.intent, list(analysis.entities), analysis.emotion
         
-        # Kiểm tra patterns trước
-        patterns = self.interactions.get("patterns", {})
-        best_pattern_score = 0
-        best_pattern_response = None
-        
-        # Kiểm tra exact match trước
-        input_lower = input_text.lower()
-        for pattern, responses in patterns.items():
-            if pattern.lower() == input_lower:
-                response = random.choice(responses)
-                if emotion:
-                    response = self.nlp.adjust_response_tone(response, emotion)
-                return response, 1.0
-                
-        # Nếu không có exact match, tìm pattern gần đúng nhất
-        for pattern, responses in patterns.items():
-            pattern_score = self.nlp.calculate_similarity(pattern, input_text)
-            if pattern_score > 0.8 and pattern_score > best_pattern_score:  # Threshold cao hơn cho pattern matching
-                best_pattern_score = pattern_score
-                best_pattern_response = random.choice(responses)
+        # Chạy trong thread pool của cog: chỉ giữ khoá khi tra pattern và chụp chỉ mục,
+        # phần chấm điểm chạy song song được giữa các worker
+        with self._lock:
+            # Kiểm tra patterns trước
+            patterns = self.interactions.get("patterns", {})
+            
+            # Kiểm tra exact match trước (từng nhánh của "a|b|c")
+            pattern = self.pattern_matcher.match_exact(input_text)
+            if pattern is not None:
+                response, pattern_score = random.choice(patterns[pattern]), 1.0
+            else:
+                # Nếu không có exact match, tìm pattern gần đúng nhất
+                # Threshold cao hơn cho pattern matching
+                pattern, pattern_score = self.pattern_matcher.match_fuzzy(input_text, 0.8)
+                response = random.choice(patterns[pattern]) if pattern is not None else None
+            if not response:
+                snapshot = self._snapshot_index(analysis, context)
+                rows = self.interactions.get("interactions", [])
                 
-        if best_pattern_response:
+        if response:
             if emotion:
-                best_pattern_response = self.nlp.adjust_response_tone(best_pattern_response, emotion)
-            return best_pattern_response, best_pattern_score
+                response = self.nlp.adjust_response_tone(response, emotion)
+            return response, pattern_score
 
         # Tìm trong interactions với NLP
-        best_match = None
-        best_score = 0
-        
-        for interaction in self.interactions.get("interactions", []):
-            # Tính điểm tương đồng ngữ nghĩa
-            similarity = self.nlp.calculate_similarity(interaction["input"], input_text)
-            
-            # Tính điểm intent và entities
-            try:
-                interaction_intent = self.nlp.analyze(interaction["input"])[0]
-                interaction_entities = self.nlp.analyze(interaction["input"])[1]
-                intent_match = interaction_intent == intent
-                entity_score = self.nlp.compare_entities(interaction_entities, entities)
-            except Exception as e:
-                print(f"Interaction Analysis Error: {str(e)}")
-                intent_match = False
-                entity_score = 0.0
-            
-            # Tổng hợp điểm
-            score = similarity * 0.6  # Trọng số cho độ tương đồng ngữ nghĩa
-            if intent_match:
-                score += 0.2  # Trọng số cho intent matching
-            score += entity_score * 0.2  # Trọng số cho entity matching
-            
-            # Tăng điểm nếu context giống nhau
-            if context and interaction.get("context"):
-                matching_context = sum(1 for k, v in context.items() 
-                                    if k in interaction["context"] 
-                                    and interaction["context"][k] == v)
-                score += matching_context * 0.1
-
-            if score > best_score:
-                best_score = score
-                best_match = interaction["output"]
+        # Chỉ xét tương tác có chung token/entity với câu hỏi
+        # (phần còn lại có similarity và entity_score bằng 0)
+        best_idx, best_score = self._score_interactions(snapshot)
+        # interactions chỉ được ghi thêm nên đọc theo vị trí ngoài khoá vẫn đúng
+        best_match = rows[best_idx]["output"] if best_idx is not None else None
 
         if best_match and best_score >= 0.6:  # Threshold thấp hơn cho NLP matching
             # Điều chỉnh response dựa trên emotion
@@ -205,9 +327,11 @@ class BotAI:
 
     def add_pattern(self, pattern: str, responses: List[str]):
         """Thêm pattern và câu trả lời tương ứng"""
-        if "patterns" not in self.interactions:
-            self.interactions["patterns"] = {}
-        self.interactions["patterns"][pattern] = responses
+        with self._lock:
+            if "patterns" not in self.interactions:
+                self.interactions["patterns"] = {}
+            self.interactions["patterns"][pattern] = responses
+            self.pattern_matcher.add(pattern)
         self.save_data()
 
     def get_stats(self) -> Dict:
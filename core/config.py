@@ -1,13 +1,92 @@
-import json, os, sys
-
-def load_config():
-    try:
-        with open("config.json", "r", encoding="utf-8") as f:
-            config = json.load(f)
-    except FileNotFoundError:
-        print("❌ Không tìm thấy file config.json. Vui lòng tạo file cấu hình.")
-        sys.exit(1)
-    except json.JSONDecodeError as e:
-        print(f"❌ Lỗi đọc config.json: {e}")
-        sys.exit(1)
-    return config
+import json, os, sys, threading, time
+from types import MappingProxyType
+from typing import Any, Mapping
+
+CONFIG_FILE = "config.json"
+# Khoảng thời gian tối thiểu giữa hai lần kiểm tra mtime của config.json
+CHECK_INTERVAL = 2.0
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _normalize(raw: dict) -> Mapping:
+    """Đổi sẵn GUILD_ID / *_CHANNEL_ID sang int, trả về snapshot chỉ đọc"""
+    data = dict(raw)
+    for key, value in raw.items():
+        if key == "GUILD_ID" or key.endswith("_CHANNEL_ID"):
+            try:
+                data[key] = int(value)
+            except (TypeError, ValueError):
+                pass
+    return _freeze(data)
+
+class ConfigService:
+    """Giữ snapshot config trong bộ nhớ, tự nạp lại khi config.json thay đổi"""
+
+    def __init__(self, path: str = CONFIG_FILE, check_interval: float = CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _read(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path, "r", encoding="utf-8") as f:
+            return _normalize(json.load(f)), mtime
+
+    def _load_initial(self):
+        try:
+            self._snapshot, self._mtime = self._read()
+        except FileNotFoundError:
+            print("❌ Không tìm thấy file config.json. Vui lòng tạo file cấu hình.")
+            sys.exit(1)
+        except json.JSONDecodeError as e:
+            print(f"❌ Lỗi đọc config.json: {e}")
+            sys.exit(1)
+        self._checked_at = time.monotonic()
+
+    def reload(self) -> bool:
+        """Đọc lại config.json; lỗi thì giữ nguyên snapshot cũ"""
+        with self._lock:
+            try:
+                snapshot, mtime = self._read()
+            except (OSError, json.JSONDecodeError) as e:
+                from .logger import log
+                log(f"⚠️ Không nạp lại được config.json, giữ cấu hình cũ: {e}")
+                return False
+            self._snapshot, self._mtime = snapshot, mtime
+            self._checked_at = time.monotonic()
+            return True
+
+    def get(self) -> Mapping:
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._load_initial()
+            return self._snapshot
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = self._mtime
+            if mtime != self._mtime:
+                # Ghi nhận mtime trước để file lỗi không bị đọc lại liên tục
+                self._mtime = mtime
+                if self.reload():
+                    from .logger import log
+                    log("🔄 Đã nạp lại config.json")
+        return self._snapshot
+
+config_service = ConfigService()
+
+def load_config() -> Mapping:
+    """Snapshot config hiện tại (chỉ đọc, không đọc lại file mỗi lần gọi)"""
+    return config_service.get()
@@ -1,17 +1,70 @@
 import discord
-from typing import Dict, List, Optional
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
 import json
 import os
-from datetime import datetime
-import re
-from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+import threading
+import time
+from collections import OrderedDict
+from .keyword_automaton import keyword_automaton
+from .regex_bank import ANSWER_RE, QUESTION_RE
+from .logger import log
+from .message_analysis import MessageAnalysis
+from .segment_store import SegmentStore
+
+@dataclass(frozen=True)
+class MessageRecord:
+    """Bản tóm gọn của một discord.Message, đủ cho việc thu thập (an toàn khi chuyển sang thread khác)"""
+    id: str
+    content: str
+    author_id: str
+    channel_id: str
+    guild_id: Optional[str]
+    reference_id: Optional[str]
+    # Có sẵn khi cog đã phân tích tin này để trả lời; nếu không hàng đợi thu thập tự phân tích
+    analysis: Optional[MessageAnalysis] = None
+
+    @classmethod
+    def from_message(cls, message: discord.Message,
+                     analysis: Optional[MessageAnalysis] = None) -> "MessageRecord":
+        return cls(
+            id=str(message.id),
+            content=message.content,
+            author_id=str(message.author.id),
+            channel_id=str(message.channel.id),
+            guild_id=str(message.guild.id) if message.guild else None,
+            reference_id=str(message.reference.message_id) if message.reference else None,
+            analysis=analysis
+        )
 
 class DataCollector:
     def __init__(self):
-        self.data_file = "data/collected_data.json"
+        # Dữ liệu thu thập lưu dạng segment JSONL chỉ-ghi-thêm + file thống kê nhỏ
+        self.data_dir = "data/collected"
+        self.stats_file = os.path.join(self.data_dir, "stats.json")
+        self.legacy_file = "data/collected_data.json"
+        self.store = SegmentStore(self.data_dir)
+        # collect_record chạy trong thread của hàng đợi thu thập (core.ingestion)
+        self._lock = threading.Lock()
         self.min_message_length = 5  # Tin nhắn tối thiểu 5 ký tự
         self.max_messages_per_topic = 1000  # Giới hạn số lượng tin nhắn mỗi chủ đề
-        self.data = self.load_data()
+        self.conversation_ttl = 24 * 3600  # Cuộc trò chuyện im lặng quá 24h thì không nối tiếp nữa
+        self.max_active_conversations = 5000
+        self.question_ttl = 24 * 3600  # Câu hỏi quá 24h chưa ai trả lời thì bỏ theo dõi
+        self.max_pending_questions = 5000
+        self.stats = self.load_stats()
+        self._migrate_legacy()
+        
+        # Chỉ mục id tin nhắn -> id cuộc trò chuyện, chỉ cho các cuộc còn hoạt động
+        self._message_index: Dict[str, str] = {}
+        # id cuộc trò chuyện -> (conversation, lần hoạt động cuối), cũ nhất đứng đầu
+        self._active_conversations: "OrderedDict[str, tuple]" = OrderedDict()
+        self._build_conversation_index()
+        # id tin nhắn câu hỏi -> (qa_pair, lúc hỏi), câu hỏi cũ nhất đứng đầu
+        self._pending_questions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._build_question_index()
         
         # Các từ khóa theo chủ đề để phân loại tin nhắn
         self.topic_keywords = {
@@ -33,175 +86,291 @@ class DataCollector:
             ]
         }
         
-        # Patterns cho việc nhận diện câu hỏi-trả lời
-        self.question_patterns = [
-            r'\?$',
-            r'^(what|how|why|when|where|who|whose|which|will|can|could|làm sao|như thế nào|khi nào|bao giờ|ai|ở đâu|tại sao)',
-            r'(cho hỏi|xin hỏi|hỏi chút|tell me|explain)'
-        ]
-        
-        # Patterns cho việc nhận diện câu trả lời
-        self.answer_patterns = [
-            r'^(here|này|đây|okay|ok|được|yes|yeah|uhm|à|ừ)',
-            r'(như sau|as follows|you can|bạn có thể|should|nên)',
-            r'(đúng vậy|chính xác|correct|right|true)'
-        ]
-
-    def load_data(self) -> Dict:
-        """Tải dữ liệu đã thu thập"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return self._init_data_structure()
-        return self._init_data_structure()
-
-    def _init_data_structure(self) -> Dict:
-        """Khởi tạo cấu trúc dữ liệu"""
-        return {
-            'conversations': [],
-            'qa_pairs': [],
-            'topics': defaultdict(list),
-            'stats': {
-                'total_messages': 0,
-                'total_conversations': 0,
-                'total_qa_pairs': 0,
-                'last_update': None
-            }
+        keyword_automaton.register("collector.topic", self.topic_keywords)
+
+    def load_stats(self) -> Dict:
+        """Tải thống kê (tổng số tin nhắn, hội thoại, cặp Q&A, số tin mỗi chủ đề)"""
+        stats = {
+            'total_messages': 0,
+            'total_conversations': 0,
+            'total_qa_pairs': 0,
+            'last_update': None,
+            'topic_counts': {}
         }
+        if os.path.exists(self.stats_file):
+            try:
+                with open(self.stats_file, 'r', encoding='utf-8') as f:
+                    stats.update(json.load(f))
+            except (OSError, ValueError) as e:
+                log(f"[LỖI] Không đọc được {self.stats_file}: {e}")
+        return stats
 
     def save_data(self):
-        """Lưu dữ liệu đã thu thập"""
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
+        """Ghi nối các bản ghi mới xuống segment và lưu thống kê"""
+        self.store.flush()
+        with self._lock:
+            stats = json.dumps(self.stats, ensure_ascii=False)
         try:
-            # Convert defaultdict to regular dict for JSON serialization
-            data_to_save = self.data.copy()
-            data_to_save['topics'] = dict(data_to_save['topics'])
-            
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data_to_save, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Error saving data: {str(e)}")
-            # Backup data
-            backup_file = f"{self.data_file}.backup"
-            with open(backup_file, 'w', encoding='utf-8') as f:
-                json.dump(data_to_save, f, ensure_ascii=False, indent=2)
-
-    def collect_message(self, message: discord.Message):
-        """Thu thập và phân tích tin nhắn"""
-        if len(message.content) < self.min_message_length:
+            os.makedirs(self.data_dir, exist_ok=True)
+            tmp = self.stats_file + ".tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(stats)
+            os.replace(tmp, self.stats_file)
+        except OSError as e:
+            log(f"[LỖI] Không lưu được {self.stats_file}: {e}")
+
+    def _migrate_legacy(self):
+        """Chuyển collected_data.json kiểu cũ sang segment (chạy một lần)"""
+        if not os.path.exists(self.legacy_file):
+            return
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            log(f"[LỖI] Không đọc được {self.legacy_file} để chuyển đổi: {e}")
+            return
+
+        def day_of(record: Dict) -> Optional[str]:
+            timestamp = record.get('timestamp')
+            return timestamp[:10] if isinstance(timestamp, str) else None
+
+        for topic, messages in legacy.get('topics', {}).items():
+            for msg in messages:
+                self.store.append(f"topics/{topic}", msg, day_of(msg))
+            counts = self.stats['topic_counts']
+            counts[topic] = counts.get(topic, 0) + len(messages)
+        for conv in legacy.get('conversations', []):
+            for msg in conv.get('messages', []):
+                self.store.append("conversations", {
+                    'conversation_id': conv['id'],
+                    'start_time': conv.get('start_time'),
+                    'message': msg
+                }, day_of(msg))
+        for qa in legacy.get('qa_pairs', []):
+            if qa.get('answer') is not None:
+                self.store.append("qa_pairs", qa, day_of(qa))
+            elif 'id' in qa.get('question', {}):
+                self.store.append("questions", qa['question'], day_of(qa))
+        for key in ('total_messages', 'total_conversations', 'total_qa_pairs'):
+            self.stats[key] += legacy.get('stats', {}).get(key, 0)
+        self.stats['last_update'] = legacy.get('stats', {}).get('last_update') or self.stats['last_update']
+
+        self.save_data()
+        os.replace(self.legacy_file, self.legacy_file + ".migrated")
+        log(f"Đã chuyển {self.legacy_file} sang segment trong {self.data_dir}")
+
+    def collect_record(self, record: MessageRecord, analysis: MessageAnalysis):
+        """Thu thập một MessageRecord theo kết quả phân tích dùng chung; người gọi tự save_data() sau mỗi lô"""
+        with self._lock:
+            self._collect_record(record, analysis)
+
+    def _collect_record(self, record: MessageRecord, analysis: MessageAnalysis):
+        if len(record.content) < self.min_message_length:
             return
             
         # Chuẩn bị dữ liệu tin nhắn
         msg_data = {
-            'content': message.content,
-            'author_id': str(message.author.id),
+            'id': record.id,
+            'content': record.content,
+            'author_id': record.author_id,
             'timestamp': datetime.now().isoformat(),
-            'channel_id': str(message.channel.id),
-            'guild_id': str(message.guild.id) if message.guild else None,
-            'reference_id': str(message.reference.message_id) if message.reference else None
+            'channel_id': record.channel_id,
+            'guild_id': record.guild_id,
+            'reference_id': record.reference_id
         }
 
         # Phân loại chủ đề
-        detected_topics = self._detect_topics(message.content)
-        for topic in detected_topics:
-            if len(self.data['topics'][topic]) < self.max_messages_per_topic:
-                self.data['topics'][topic].append(msg_data)
+        is_question, is_answer = analysis.is_question, analysis.is_answer
+        topic_counts = self.stats['topic_counts']
+        for topic in analysis.topics:
+            if topic_counts.get(topic, 0) < self.max_messages_per_topic:
+                self.store.append(f"topics/{topic}", msg_data)
+                topic_counts[topic] = topic_counts.get(topic, 0) + 1
 
         # Kiểm tra nếu là một phần của cuộc trò chuyện
-        if message.reference:
-            self._process_conversation(message, msg_data)
+        if record.reference_id:
+            self._process_conversation(msg_data)
 
         # Kiểm tra và lưu cặp Q&A
-        if self._is_question(message.content):
+        if is_question:
             self._track_question(msg_data)
-        elif message.reference and self._is_answer(message.content):
-            self._track_answer(message, msg_data)
+        elif record.reference_id and is_answer:
+            self._track_answer(msg_data)
 
         # Cập nhật thống kê
-        self.data['stats']['total_messages'] += 1
-        self.data['stats']['last_update'] = datetime.now().isoformat()
-        
-        # Tự động lưu sau mỗi 100 tin nhắn
-        if self.data['stats']['total_messages'] % 100 == 0:
-            self.save_data()
+        self.stats['total_messages'] += 1
+        self.stats['last_update'] = datetime.now().isoformat()
 
     def _detect_topics(self, content: str) -> List[str]:
         """Phát hiện chủ đề của tin nhắn"""
-        content = content.lower()
-        topics = []
-        for topic, keywords in self.topic_keywords.items():
-            if any(keyword in content for keyword in keywords):
-                topics.append(topic)
-        return topics
+        return keyword_automaton.scan(content).categories("collector.topic")
 
     def _is_question(self, content: str) -> bool:
         """Kiểm tra xem có phải câu hỏi không"""
         content = content.lower().strip()
-        return any(re.search(pattern, content) for pattern in self.question_patterns)
+        return QUESTION_RE.search(content) is not None
 
     def _is_answer(self, content: str) -> bool:
         """Kiểm tra xem có phải câu trả lời không"""
         content = content.lower().strip()
-        return any(re.search(pattern, content) for pattern in self.answer_patterns)
+        return ANSWER_RE.search(content) is not None
 
-    def _process_conversation(self, message: discord.Message, msg_data: Dict):
+    def _since_day(self, ttl: float) -> str:
+        """Ngày của segment cũ nhất có thể chứa dữ liệu trong `ttl` giây gần đây"""
+        return (datetime.now() - timedelta(seconds=ttl)).strftime("%Y-%m-%d")
+
+    def _build_conversation_index(self):
+        """Dựng chỉ mục từ các segment hội thoại còn trong thời hạn"""
+        self._message_index.clear()
+        self._active_conversations.clear()
+        conversations: Dict[str, tuple] = {}
+        for record in self.store.read("conversations", since=self._since_day(self.conversation_ttl)):
+            msg = record.get('message', {})
+            try:
+                last_active = datetime.fromisoformat(msg['timestamp']).timestamp()
+            except (KeyError, TypeError, ValueError):
+                continue
+            conv_id = record['conversation_id']
+            if conv_id not in conversations:
+                conversations[conv_id] = ({
+                    'id': conv_id,
+                    'message_ids': [],
+                    'participants': [],
+                    'start_time': record.get('start_time')
+                }, last_active)
+            conversation = conversations[conv_id][0]
+            if 'id' in msg:
+                conversation['message_ids'].append(msg['id'])
+            if msg.get('author_id') not in conversation['participants']:
+                conversation['participants'].append(msg.get('author_id'))
+            conversations[conv_id] = (conversation, max(last_active, conversations[conv_id][1]))
+        for conversation, last_active in sorted(conversations.values(), key=lambda item: item[1]):
+            self._touch_conversation(conversation, last_active)
+            for msg_id in conversation['message_ids']:
+                self._message_index[msg_id] = conversation['id']
+        self._evict_conversations(time.time())
+
+    def _touch_conversation(self, conversation: Dict, now: float):
+        self._active_conversations[conversation['id']] = (conversation, now)
+        self._active_conversations.move_to_end(conversation['id'])
+
+    def _evict_conversations(self, now: float):
+        """Bỏ khỏi chỉ mục các cuộc trò chuyện hết hạn hoặc vượt giới hạn (dữ liệu vẫn giữ)"""
+        cutoff = now - self.conversation_ttl
+        while self._active_conversations:
+            conv_id, (conversation, last_active) = next(iter(self._active_conversations.items()))
+            if last_active >= cutoff and len(self._active_conversations) <= self.max_active_conversations:
+                break
+            del self._active_conversations[conv_id]
+            for msg_id in conversation['message_ids']:
+                if self._message_index.get(msg_id) == conv_id:
+                    del self._message_index[msg_id]
+
+    def _process_conversation(self, msg_data: Dict):
         """Xử lý và lưu trữ cuộc trò chuyện"""
-        # Tìm hoặc tạo cuộc trò chuyện mới
+        now = time.time()
+        self._evict_conversations(now)
+        
+        # Tìm cuộc trò chuyện chứa tin nhắn được reply (O(1) qua chỉ mục)
         conversation = None
-        for conv in self.data['conversations']:
-            if message.reference.message_id in [msg['id'] for msg in conv['messages']]:
-                conversation = conv
-                break
+        conv_id = self._message_index.get(msg_data['reference_id'])
+        if conv_id is not None:
+            conversation = self._active_conversations[conv_id][0]
 
         if not conversation:
+            # Chỉ giữ id tin nhắn trong bộ nhớ, nội dung ghi nối vào segment
             conversation = {
                 'id': str(datetime.now().timestamp()),
-                'messages': [],
-                'participants': set(),
+                'message_ids': [],
+                'participants': [],
                 'start_time': datetime.now().isoformat()
             }
-            self.data['conversations'].append(conversation)
-            self.data['stats']['total_conversations'] += 1
+            self.stats['total_conversations'] += 1
 
         # Thêm tin nhắn vào cuộc trò chuyện
-        msg_data['id'] = str(message.id)
-        conversation['messages'].append(msg_data)
-        conversation['participants'].add(str(message.author.id))
-        # Convert participants set to list for JSON serialization
-        conversation['participants'] = list(conversation['participants'])
+        conversation['message_ids'].append(msg_data['id'])
+        self.store.append("conversations", {
+            'conversation_id': conversation['id'],
+            'start_time': conversation['start_time'],
+            'message': msg_data
+        })
+        if msg_data['author_id'] not in conversation['participants']:
+            conversation['participants'].append(msg_data['author_id'])
+        self._message_index[msg_data['id']] = conversation['id']
+        self._touch_conversation(conversation, now)
+
+    def _build_question_index(self):
+        """Dựng lại danh sách câu hỏi chờ trả lời từ các segment gần đây"""
+        self._pending_questions.clear()
+        since = self._since_day(self.question_ttl)
+        answered = {qa['question'].get('id') for qa in self.store.read("qa_pairs", since=since)}
+        for question in self.store.read("questions", since=since):
+            if question.get('id') in answered:
+                continue
+            try:
+                asked_at = datetime.fromisoformat(question['timestamp']).timestamp()
+            except (KeyError, TypeError, ValueError):
+                continue
+            self._pending_questions[question['id']] = ({
+                'question': question,
+                'answer': None,
+                'timestamp': question['timestamp']
+            }, asked_at)
+            self._pending_questions.move_to_end(question['id'])
+        self._expire_questions(time.time())
+
+    def _expire_questions(self, now: float):
+        """Bỏ theo dõi câu hỏi quá hạn hoặc vượt giới hạn (câu hỏi vẫn nằm trong segment)"""
+        cutoff = now - self.question_ttl
+        while self._pending_questions:
+            asked_at = next(iter(self._pending_questions.values()))[1]
+            if asked_at >= cutoff and len(self._pending_questions) <= self.max_pending_questions:
+                break
+            self._pending_questions.popitem(last=False)
 
     def _track_question(self, msg_data: Dict):
         """Theo dõi câu hỏi để ghép cặp Q&A"""
-        self.data['qa_pairs'].append({
+        qa = {
             'question': msg_data,
             'answer': None,
             'timestamp': datetime.now().isoformat()
-        })
+        }
+        self.store.append("questions", msg_data)
+        now = time.time()
+        self._pending_questions[msg_data['id']] = (qa, now)
+        self._expire_questions(now)
 
-    def _track_answer(self, message: discord.Message, msg_data: Dict):
+    def _track_answer(self, msg_data: Dict):
         """Theo dõi và ghép cặp câu trả lời với câu hỏi"""
-        # Tìm câu hỏi tương ứng
-        for qa in self.data['qa_pairs']:
-            if (qa['answer'] is None and 
-                qa['question']['id'] == str(message.reference.message_id)):
-                qa['answer'] = msg_data
-                self.data['stats']['total_qa_pairs'] += 1
-                break
+        self._expire_questions(time.time())
+        # Tìm câu hỏi tương ứng (O(1) theo id tin nhắn được reply)
+        pending = self._pending_questions.pop(msg_data['reference_id'], None)
+        if pending is not None:
+            qa = pending[0]
+            qa['answer'] = msg_data
+            # Chỉ cặp đã có câu trả lời mới được ghi vào qa_pairs
+            self.store.append("qa_pairs", qa)
+            self.stats['total_qa_pairs'] += 1
+
+    def iter_topic_data(self, topic: str) -> Iterator[Dict]:
+        """Duyệt lần lượt tin nhắn của một chủ đề, cũ trước"""
+        return self.store.read(f"topics/{topic}")
+
+    def iter_qa_pairs(self) -> Iterator[Dict]:
+        """Duyệt lần lượt các cặp Q&A đã có câu trả lời, cũ trước"""
+        return self.store.read("qa_pairs")
 
     def get_topic_data(self, topic: str, limit: int = 100) -> List[Dict]:
         """Lấy dữ liệu theo chủ đề"""
-        return self.data['topics'].get(topic, [])[:limit]
+        return list(islice(self.iter_topic_data(topic), limit))
 
     def get_qa_pairs(self, limit: int = 100) -> List[Dict]:
         """Lấy các cặp Q&A đã thu thập"""
-        return [qa for qa in self.data['qa_pairs'] 
-                if qa['answer'] is not None][:limit]
+        return list(islice(self.iter_qa_pairs(), limit))
 
     def get_stats(self) -> Dict:
         """Lấy thống kê về dữ liệu đã thu thập"""
-        return self.data['stats']
+        return self.stats
 
     def export_training_data(self, format: str = 'json') -> str:
         """Xuất dữ liệu để training"""
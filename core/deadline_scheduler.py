@@ -0,0 +1,83 @@
+import asyncio, heapq, time
+from typing import Dict, List, Optional
+
+# Nhắc người nhận đơn trước hạn chót 1 tiếng
+REMINDER_WINDOW = 3600
+
+class DeadlineScheduler:
+    """Min-heap (thời điểm sự kiện kế tiếp, mã đơn) cho các đơn đang được xử lý"""
+
+    def __init__(self):
+        self._heap = []
+        self._next: Dict[str, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._sleep_until = float("inf")
+
+    @staticmethod
+    def next_event_time(order: dict) -> Optional[float]:
+        """Thời điểm cần xử lý đơn tiếp theo (nhắc nhở hoặc quá hạn)"""
+        if order.get("thoi_han_ts") is None or not order.get("nguoi_nhan_id"):
+            return None
+        if order.get("trang_thai") == "✅ Đã hoàn thành" or order.get("qua_han"):
+            return None
+        deadline = order["thoi_han_ts"]
+        if not order.get("da_nhac_het_gio") and deadline > time.time():
+            return deadline - REMINDER_WINDOW
+        return deadline
+
+    def schedule(self, order_id: str, order: dict, not_before: Optional[float] = None):
+        """Thêm/cập nhật lịch của một đơn (gọi lại sau mỗi lần đơn thay đổi)"""
+        when = self.next_event_time(order)
+        if when is None:
+            self.cancel(order_id)
+            return
+        if not_before is not None:
+            when = max(when, not_before)
+        self._next[order_id] = when
+        heapq.heappush(self._heap, (when, order_id))
+        if when < self._sleep_until and self._wakeup:
+            self._wakeup.set()
+        # Bỏ bớt các entry đã cũ khi heap phình quá lớn
+        if len(self._heap) > 2 * len(self._next) + 64:
+            self._heap = [(w, oid) for oid, w in self._next.items()]
+            heapq.heapify(self._heap)
+
+    def cancel(self, order_id: str):
+        # Entry trong heap được bỏ qua khi lấy ra (lazy deletion)
+        self._next.pop(order_id, None)
+
+    def load(self, orders: dict):
+        for order_id, order in orders.items():
+            self.schedule(order_id, order)
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        """Lấy các đơn đã tới thời điểm xử lý"""
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, order_id = heapq.heappop(self._heap)
+            if self._next.get(order_id) == when:
+                del self._next[order_id]
+                due.append(order_id)
+        return due
+
+    async def wait_next(self):
+        """Ngủ tới sự kiện gần nhất hoặc tới khi lịch thay đổi"""
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.clear()
+        while self._heap and self._next.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        self._sleep_until = self._heap[0][0] if self._heap else float("inf")
+        timeout = max(self._sleep_until - time.time(), 0) if self._heap else None
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._sleep_until = float("inf")
+
+    def __len__(self) -> int:
+        return len(self._next)
+
+deadline_scheduler = DeadlineScheduler()
@@ -0,0 +1,112 @@
+import asyncio
+from typing import List, Optional
+from .data_collector import DataCollector, MessageRecord
+from .logger import log
+from .message_analysis import MessageAnalyzer
+
+class IngestionPipeline:
+    """Hàng đợi thu thập tin nhắn chạy nền.
+
+    on_message chỉ gọi submit() (put_nowait, O(1)); hàng đợi đầy thì bỏ tin
+    và tăng bộ đếm `dropped`. Consumer gom tối đa `batch_size` tin (hoặc chờ
+    tối đa `batch_interval` giây), phân loại + ghi trong một thread rồi ghi
+    nối segment một lần cho cả lô.
+    """
+
+    def __init__(self, collector: DataCollector, analyzer: MessageAnalyzer, max_size: int = 1000,
+                 batch_size: int = 50, batch_interval: float = 2.0):
+        self.collector = collector
+        self.analyzer = analyzer
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.queue: "asyncio.Queue[MessageRecord]" = asyncio.Queue(maxsize=max_size)
+        self.dropped = 0
+        self.processed = 0
+        self.batches = 0
+        self._task = None
+        # Lô đang được ghi trong thread (stop() chờ nó xong thay vì bỏ dở)
+        self._inflight: Optional[asyncio.Future] = None
+        # Lô đang gom dở (để stop() không làm mất tin đã lấy khỏi hàng đợi)
+        self._batch: List[MessageRecord] = []
+
+    @classmethod
+    def from_config(cls, collector: DataCollector, analyzer: MessageAnalyzer, config) -> "IngestionPipeline":
+        """Đọc INGESTION {"max_size", "batch_size", "batch_interval"} từ config"""
+        settings = config.get("INGESTION", {})
+        return cls(collector, analyzer, settings.get("max_size", 1000), settings.get("batch_size", 50),
+                   settings.get("batch_interval", 2.0))
+
+    def submit(self, record: MessageRecord) -> bool:
+        """Đưa tin vào hàng đợi; trả về False nếu bị bỏ vì hàng đợi đầy"""
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                log(f"⚠️ Hàng đợi thu thập đầy, đã bỏ {self.dropped} tin nhắn",
+                    queue_size=self.queue.qsize())
+            return False
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._task = loop.create_task(self.run())
+
+    async def _next_batch(self) -> List[MessageRecord]:
+        self._batch.append(await self.queue.get())
+        deadline = asyncio.get_running_loop().time() + self.batch_interval
+        while len(self._batch) < self.batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                self._batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        batch, self._batch = self._batch, []
+        return batch
+
+    def _process_batch(self, batch: List[MessageRecord]):
+        for record in batch:
+            try:
+                # Tin đã được cog phân tích để trả lời thì dùng lại kết quả đó
+                analysis = record.analysis or self.analyzer.analyze(record.content)
+                self.collector.collect_record(record, analysis)
+            except Exception as e:
+                log(f"[LỖI] Thu thập tin nhắn thất bại: {e}", message_id=record.id)
+        self.collector.save_data()
+        self.processed += len(batch)
+        self.batches += 1
+
+    async def run(self):
+        while True:
+            batch = await self._next_batch()
+            self._inflight = asyncio.ensure_future(asyncio.to_thread(self._process_batch, batch))
+            # shield: huỷ consumer không huỷ lô đang ghi, stop() sẽ chờ nó
+            await asyncio.shield(self._inflight)
+            self._inflight = None
+
+    async def stop(self):
+        """Dừng consumer, chờ lô đang ghi xong rồi xử lý nốt các tin còn trong hàng đợi"""
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if self._inflight is not None:
+            inflight, self._inflight = self._inflight, None
+            try:
+                await inflight
+            except Exception as e:
+                log(f"[LỖI] Ghi lô tin nhắn thất bại: {e}")
+        batch, self._batch = self._batch, []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if batch:
+            await asyncio.to_thread(self._process_batch, batch)
+
+    def get_stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "batches": self.batches
+        }
@@ -0,0 +1,144 @@
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+class ScanResult:
+    """Kết quả một lần quét: các từ khóa tìm thấy theo (namespace, category)"""
+    __slots__ = ("hits", "_matched", "_tables")
+
+    def __init__(self, hits: List[Tuple[str, str, int]], matched: Dict[Tuple[str, str], Set[int]],
+                 tables: Dict[str, Dict[str, List[str]]]):
+        self.hits = hits  # (namespace.category, keyword, vị trí bắt đầu)
+        self._matched = matched
+        self._tables = tables
+
+    def found(self, namespace: str, category: str) -> List[str]:
+        """Các từ khóa của category xuất hiện trong text, theo thứ tự trong bảng"""
+        indexes = self._matched.get((namespace, category))
+        if not indexes:
+            return []
+        keywords = self._tables[namespace][category]
+        return [keywords[i] for i in sorted(indexes)]
+
+    def count(self, namespace: str, category: str) -> int:
+        """Tương đương sum(word in text for word in keywords)"""
+        return len(self._matched.get((namespace, category), ()))
+
+    def categories(self, namespace: str) -> List[str]:
+        """Các category có ít nhất một từ khóa xuất hiện, theo thứ tự trong bảng"""
+        return [category for category in self._tables.get(namespace, {})
+                if (namespace, category) in self._matched]
+
+class KeywordAutomaton:
+    """Automaton Aho–Corasick dùng chung cho mọi bảng từ khóa.
+
+    Mỗi module đăng ký bảng {category: [keyword]} dưới một namespace; scan()
+    duyệt text một lần và trả về mọi từ khóa xuất hiện (so khớp chuỗi con,
+    giống `keyword in text`).
+    """
+
+    def __init__(self, cache_size: int = 1024):
+        self._tables: Dict[str, Dict[str, List[str]]] = {}
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, ScanResult]" = OrderedDict()
+        self.cache_size = cache_size
+        self._dirty = True
+        self._goto: List[Dict[str, int]] = []
+        self._fail: List[int] = []
+        self._out: List[List[int]] = []
+        self._keywords: List[str] = []
+        self._entries: List[List[Tuple[str, str, int]]] = []
+
+    def register(self, namespace: str, table: Dict[str, Iterable[str]]):
+        """Đăng ký (hoặc thay thế) bảng từ khóa của một namespace"""
+        with self._lock:
+            # Tạo dict mới để ScanResult cũ vẫn trỏ tới bảng đã dùng khi quét
+            self._tables = {**self._tables, namespace: {
+                category: [kw.lower() for kw in keywords] for category, keywords in table.items()
+            }}
+            self._dirty = True
+            self._cache.clear()
+
+    def _build(self):
+        keyword_ids: Dict[str, int] = {}
+        self._keywords, self._entries = [], []
+        for namespace, table in self._tables.items():
+            for category, keywords in table.items():
+                for idx, keyword in enumerate(keywords):
+                    if not keyword:
+                        continue
+                    kid = keyword_ids.get(keyword)
+                    if kid is None:
+                        kid = keyword_ids[keyword] = len(self._keywords)
+                        self._keywords.append(keyword)
+                        self._entries.append([])
+                    self._entries[kid].append((namespace, category, idx))
+
+        goto, fail, out = [{}], [0], [[]]
+        for kid, keyword in enumerate(self._keywords):
+            node = 0
+            for ch in keyword:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    out.append([])
+                node = nxt
+            out[node].append(kid)
+
+        # BFS tính fail link, gộp output của fail vào node hiện tại
+        queue = list(goto[0].values())
+        for node in queue:
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._goto, self._fail, self._out = goto, fail, out
+        self._dirty = False
+
+    def scan(self, text: str) -> ScanResult:
+        text = text.lower()
+        with self._lock:
+            if self._dirty:
+                self._build()
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                return cached
+            goto, fail, out = self._goto, self._fail, self._out
+            keywords, entries, tables = self._keywords, self._entries, self._tables
+
+        hits: List[Tuple[str, str, int]] = []
+        matched: Dict[Tuple[str, str], Set[int]] = defaultdict(set)
+        seen: Set[int] = set()
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for kid in out[node]:
+                keyword = keywords[kid]
+                start = i - len(keyword) + 1
+                for namespace, category, idx in entries[kid]:
+                    hits.append((f"{namespace}.{category}", keyword, start))
+                if kid not in seen:
+                    seen.add(kid)
+                    for namespace, category, idx in entries[kid]:
+                        matched[(namespace, category)].add(idx)
+
+        result = ScanResult(hits, dict(matched), tables)
+        with self._lock:
+            if tables is self._tables:
+                self._cache[text] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+# Automaton dùng chung cho NLPProcessor, DataCollector và CaveStoreAI
+keyword_automaton = KeywordAutomaton()
@@ -1,6 +1,98 @@
-from datetime import datetime, timezone
+import atexit
+import logging
+import logging.handlers
+import queue
+import time
 
-def log(message: str):
-    with open("log.txt", "a", encoding="utf-8") as f:
-        t = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-        f.write(f"[{t}] {message}\n")
+LOG_FILE = "log.txt"
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+_logger = logging.getLogger("cavestore")
+_listener = None
+
+class _Formatter(logging.Formatter):
+    """[thời gian UTC] nội dung key=value ..."""
+    converter = time.gmtime
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return text
+
+class BatchingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler chỉ flush theo lô thay vì sau mỗi dòng"""
+
+    def __init__(self, filename: str, flush_every: int = 50, flush_interval: float = 1.0, **kwargs):
+        super().__init__(filename, encoding="utf-8", **kwargs)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        # StreamHandler.emit gọi flush() sau mỗi record
+        self._unflushed += 1
+        if (self._unflushed >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush_pending()
+
+    def flush_pending(self):
+        if self._unflushed:
+            super().flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush_pending()
+        super().close()
+
+class _Listener(logging.handlers.QueueListener):
+    """QueueListener flush nốt lô đang dở khi hàng đợi rảnh"""
+
+    def __init__(self, q, *handlers, flush_interval: float = 1.0):
+        super().__init__(q, *handlers, respect_handler_level=True)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                for handler in self.handlers:
+                    if isinstance(handler, BatchingRotatingFileHandler):
+                        handler.flush_pending()
+
+def setup_logging(level: int = logging.INFO):
+    """Gắn QueueHandler vào root logger, ghi file bằng thread nền"""
+    global _listener
+    if _listener is not None:
+        return
+    file_handler = BatchingRotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+    )
+    file_handler.setFormatter(_Formatter("[%(asctime)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    _listener = _Listener(log_queue, file_handler)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Ghi nốt log còn trong hàng đợi"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+def log(message: str, **fields):
+    """Ghi log (chỉ đưa vào hàng đợi); fields: order_id, guild, latency_ms..."""
+    if _listener is None:
+        setup_logging()
+    _logger.info(message, extra={"fields": fields} if fields else None)
@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import FrozenSet, Mapping, Optional, Tuple
+from .cache import BoundedCache
+
+@dataclass(frozen=True)
+class MessageAnalysis:
+    """Kết quả phân tích một tin nhắn, tính một lần và dùng chung"""
+    text: str
+    normalized: str
+    tokens: FrozenSet[str]
+    intent_scores: Mapping[str, float]
+    intent: Optional[str]
+    entities: Tuple[str, ...]
+    emotion: Optional[str]
+    topics: Tuple[str, ...]
+    is_question: bool
+    is_answer: bool
+
+class MessageAnalyzer:
+    """Tạo MessageAnalysis từ NLPProcessor (+ DataCollector nếu có), cache theo nội dung"""
+
+    def __init__(self, nlp, collector=None, cache_size: int = 1000):
+        self.nlp = nlp
+        self.collector = collector
+        self._cache = BoundedCache(max_size=cache_size, ttl=3600)
+
+    def analyze(self, text: str) -> MessageAnalysis:
+        cached = self._cache.get(text)
+        if cached is not None:
+            return cached
+
+        normalized = text.lower().strip()
+        try:
+            intent_scores, intent, entities, emotion = self.nlp.analyze_full(text)
+        except Exception as e:
+            print(f"NLP Error: {str(e)}")
+            intent_scores, intent, entities, emotion = {}, None, [], None
+
+        topics, is_question, is_answer = (), False, False
+        if self.collector is not None:
+            topics = tuple(self.collector._detect_topics(normalized))
+            is_question = self.collector._is_question(normalized)
+            is_answer = self.collector._is_answer(normalized)
+
+        analysis = MessageAnalysis(
+            text=text,
+            normalized=normalized,
+            tokens=self.nlp.tokens(text),
+            intent_scores=MappingProxyType(dict(intent_scores)),
+            intent=intent,
+            entities=tuple(entities),
+            emotion=emotion,
+            topics=topics,
+            is_question=is_question,
+            is_answer=is_answer,
+        )
+        self._cache.set(text, analysis)
+        return analysis
@@ -3,13 +3,15 @@ from typing import Dict, List, Tuple
 from datetime import datetime
 import random
 
-from functools import lru_cache
+from .cache import BoundedCache
+from .keyword_automaton import keyword_automaton
 
 class NLPProcessor:
     def __init__(self):
-        # Cache cho các kết quả phân tích
-        self._cache = {}
-        self._cache_size = 1000
+        # Cache cho các kết quả phân tích (riêng từng instance)
+        self._intent_cache = BoundedCache(max_size=1000, ttl=3600)
+        # Tập token theo từng text, dùng lại cho mọi cặp so sánh
+        self._token_cache = BoundedCache(max_size=5000, ttl=3600)
         
         # Từ khóa theo chủ đề
         self.topic_keywords = {
@@ -31,22 +33,29 @@ class NLPProcessor:
             'confused': ['sao', 'làm sao', 'thế nào', 'như nào', 'không hiểu', 'khó hiểu'],
         }
 
+        # Quét từ khóa một lượt bằng automaton dùng chung
+        keyword_automaton.register("nlp.topic", self.topic_keywords)
+        keyword_automaton.register("nlp.emotion", self.emotion_keywords)
+
         # Context lịch sử
         self.conversation_history = []
         self.max_history = 5
 
-    @lru_cache(maxsize=1000)
     def analyze_intent(self, text: str) -> Dict[str, float]:
         """Phân tích ý định của câu hỏi với cache và context"""
+        return self._intent_cache.get_or_compute(text, lambda: self._analyze_intent(text))
+
+    def _analyze_intent(self, text: str) -> Dict[str, float]:
         text = text.lower()
+        scan = keyword_automaton.scan(text)
         scores = {}
         
         # Lấy top 3 intent có điểm cao nhất để tránh lặp lại
         top_intents = []
         
         # Tính điểm cho từng chủ đề và lưu top 3
-        for topic, keywords in self.topic_keywords.items():
-            score = sum(1.0 for word in keywords if word in text)
+        for topic in scan.categories("nlp.topic"):
+            score = float(scan.count("nlp.topic", topic))
             if score > 0:
                 score = score / len(text.split())
                 scores[topic] = score
@@ -59,8 +68,8 @@ class NLPProcessor:
             scores = {top_intent[0]: top_intent[1]}
 
         # Phân tích cảm xúc
-        for emotion, keywords in self.emotion_keywords.items():
-            score = sum(1.0 for word in keywords if word in text)
+        for emotion in scan.categories("nlp.emotion"):
+            score = float(scan.count("nlp.emotion", emotion))
             if score > 0:
                 scores[f"emotion_{emotion}"] = score / len(text.split())
 
@@ -187,6 +196,16 @@ class NLPProcessor:
     # === Methods required for ai_handler.py integration ===
     def analyze(self, text: str):
         """Return (intent, entities) tuple."""
+        _, intent, entities, _ = self.analyze_full(text)
+        return intent, entities
+
+    def detect_emotion(self, text: str):
+        """Detect emotion from text using emotion_keywords."""
+        emotions = keyword_automaton.scan(text).categories("nlp.emotion")
+        return emotions[0] if emotions else None
+
+    def analyze_full(self, text: str):
+        """Return (intent_scores, intent, entities, emotion) from a single keyword scan."""
         intent_scores = self.analyze_intent(text)
         # Pick the highest scoring intent as main intent
         intent = None
@@ -196,24 +215,19 @@ class NLPProcessor:
                 intent = k
                 max_score = v
         # Simple entity extraction: return keywords found
-        entities = [word for topic in self.topic_keywords.values() for word in topic if word in text.lower()]
-        return intent, entities
+        scan = keyword_automaton.scan(text)
+        entities = [word for topic in self.topic_keywords for word in scan.found("nlp.topic", topic)]
+        emotions = scan.categories("nlp.emotion")
+        return intent_scores, intent, entities, (emotions[0] if emotions else None)
 
-    def detect_emotion(self, text: str):
-        """Detect emotion from text using emotion_keywords."""
-        text = text.lower()
-        for emotion, keywords in self.emotion_keywords.items():
-            for word in keywords:
-                if word in text:
-                    return emotion
-        return None
+    def tokens(self, text: str) -> frozenset:
+        """Lowercased word set of a text, memoized per distinct text."""
+        return self._token_cache.get_or_compute(text, lambda: frozenset(text.lower().split()))
 
-    @lru_cache(maxsize=1000)
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """Rudimentary similarity: Jaccard index of word sets with cache."""
-        # Convert to frozen sets for hashability in cache
-        set1 = frozenset(text1.lower().split())
-        set2 = frozenset(text2.lower().split())
+        set1 = self.tokens(text1)
+        set2 = self.tokens(text2)
         if not set1 or not set2:
             return 0.0
         return len(set1 & set2) / len(set1 | set2)
@@ -310,6 +324,10 @@ class NLPProcessor:
 
         return base.strip()
 
+    def get_cache_stats(self) -> Dict[str, Dict]:
+        """Hit/miss counters of the analysis caches."""
+        return {"intent": self._intent_cache.get_stats(), "tokens": self._token_cache.get_stats()}
+
     def update_model(self, input_text, output_text, intent, entities):
         """Stub for model update (no-op for now)."""
         pass
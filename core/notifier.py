@@ -0,0 +1,224 @@
+import asyncio
+import random
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import discord
+from .logger import log
+
+# Giới hạn độ dài tin nhắn Discord
+MAX_CONTENT_LENGTH = 2000
+MAX_EMBEDS_PER_MESSAGE = 10
+
+class TokenBucket:
+    """Token bucket đơn giản cho một route gửi tin"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self) -> float:
+        """Lấy một token, trả về số giây cần chờ trước khi gửi"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def block_for(self, seconds: float, remaining: Optional[int] = None):
+        """Áp thông tin rate limit từ Discord (Retry-After / X-RateLimit-*)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+
+
+class Notice:
+    __slots__ = ("content", "embed")
+
+    def __init__(self, content: Optional[str] = None, embed: Optional[discord.Embed] = None):
+        self.content = content
+        self.embed = embed
+
+
+class NotificationDispatcher:
+    """Hàng đợi gửi DM/tin nhắn kênh chạy nền với số worker giới hạn.
+
+    Các thông báo tới cùng một đích đang chờ trong hàng đợi được gộp vào
+    một lần gửi; mỗi đích có token bucket riêng và được thử lại với backoff.
+    """
+
+    def __init__(self, bot, user_cache=None, workers: int = 4, max_retries: int = 3,
+                 route_rate: Tuple[int, float] = (5, 5.0), global_rate: int = 45):
+        self.bot = bot
+        self.user_cache = user_cache
+        self.workers = workers
+        self.max_retries = max_retries
+        self.route_rate = route_rate
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._buckets: Dict[Tuple[str, int], TokenBucket] = {}
+        self._pending: Dict[Tuple[str, int], List[Notice]] = {}
+        # Đích đang được một worker gửi; thông báo mới cho đích đó chờ worker này gửi tiếp
+        self._active: Set[Tuple[str, int]] = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"sent": 0, "coalesced": 0, "retried": 0, "failed": 0}
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        # Thông báo được gửi trước khi start() thì đưa vào hàng đợi luôn
+        for key in self._pending:
+            self._queue.put_nowait(key)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0):
+        """Gửi nốt các thông báo còn trong hàng đợi rồi dừng worker"""
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                log(f"[THÔNG BÁO] Bỏ {len(self._pending)} thông báo chưa gửi khi tắt bot")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def notify_user(self, user_id: int, content: Optional[str] = None, embed: Optional[discord.Embed] = None):
+        """Xếp hàng DM cho user, trả về ngay"""
+        self._enqueue(("user", int(user_id)), Notice(content, embed))
+
+    def notify_channel(self, channel_id: int, content: Optional[str] = None, embed: Optional[discord.Embed] = None):
+        """Xếp hàng tin nhắn vào kênh, trả về ngay"""
+        self._enqueue(("channel", int(channel_id)), Notice(content, embed))
+
+    def _enqueue(self, key: Tuple[str, int], notice: Notice):
+        if key in self._pending:
+            self._pending[key].append(notice)
+            self.stats["coalesced"] += 1
+            return
+        self._pending[key] = [notice]
+        if self._queue is not None and key not in self._active:
+            self._queue.put_nowait(key)
+
+    def _bucket(self, key: Tuple[str, int]) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            capacity, per = self.route_rate
+            bucket = self._buckets[key] = TokenBucket(capacity / per, capacity)
+        return bucket
+
+    async def _worker(self):
+        while True:
+            key = await self._queue.get()
+            notices = self._pending.pop(key, [])
+            self._active.add(key)
+            try:
+                if notices:
+                    await self._deliver(key, notices)
+            except Exception as e:
+                log(f"[THÔNG BÁO] Lỗi không mong muốn khi gửi tới {key[0]} {key[1]}: {e}")
+            finally:
+                self._active.discard(key)
+                # Thông báo đến trong lúc đang gửi: xếp hàng lại để giữ đúng thứ tự
+                if key in self._pending:
+                    self._queue.put_nowait(key)
+                self._queue.task_done()
+
+    async def _resolve(self, key: Tuple[str, int]):
+        kind, target_id = key
+        if kind == "user":
+            if self.user_cache is not None:
+                return await self.user_cache.get_dm_channel(target_id)
+            return self.bot.get_user(target_id) or await self.bot.fetch_user(target_id)
+        return self.bot.get_channel(target_id) or await self.bot.fetch_channel(target_id)
+
+    @staticmethod
+    def _build_payloads(notices: List[Notice]) -> List[Dict]:
+        """Gộp nhiều thông báo thành ít tin nhắn nhất có thể"""
+        chunks, current = [], ""
+        for notice in notices:
+            if not notice.content:
+                continue
+            text = notice.content[:MAX_CONTENT_LENGTH]
+            if current and len(current) + 1 + len(text) > MAX_CONTENT_LENGTH:
+                chunks.append(current)
+                current = text
+            else:
+                current = f"{current}\n{text}" if current else text
+        if current:
+            chunks.append(current)
+
+        embeds = [n.embed for n in notices if n.embed is not None]
+        embed_groups = [embeds[i:i + MAX_EMBEDS_PER_MESSAGE]
+                        for i in range(0, len(embeds), MAX_EMBEDS_PER_MESSAGE)]
+
+        payloads = [{"content": chunk} for chunk in chunks]
+        for i, group in enumerate(embed_groups):
+            if i < len(payloads):
+                payloads[i]["embeds"] = group
+            else:
+                payloads.append({"embeds": group})
+        return payloads
+
+    @staticmethod
+    def _rate_limit_info(error: discord.HTTPException) -> Tuple[Optional[float], Optional[int]]:
+        """Đọc Retry-After / X-RateLimit-* từ response lỗi"""
+        retry_after = getattr(error, "retry_after", None)
+        remaining = None
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            if retry_after is None and headers.get("Retry-After"):
+                retry_after = float(headers["Retry-After"])
+            if retry_after is None and headers.get("X-RateLimit-Reset-After"):
+                retry_after = float(headers["X-RateLimit-Reset-After"])
+            if headers.get("X-RateLimit-Remaining") is not None:
+                remaining = int(headers["X-RateLimit-Remaining"])
+        except (TypeError, ValueError):
+            pass
+        return retry_after, remaining
+
+    async def _deliver(self, key: Tuple[str, int], notices: List[Notice]):
+        bucket = self._bucket(key)
+        payloads = self._build_payloads(notices)
+        sent = 0
+        for attempt in range(self.max_retries + 1):
+            try:
+                target = await self._resolve(key)
+                while sent < len(payloads):
+                    wait = max(bucket.reserve(), self._global_bucket.reserve())
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    await target.send(**payloads[sent])
+                    sent += 1
+                    self.stats["sent"] += 1
+                return
+            except discord.Forbidden as e:
+                # User tắt DM / bot không có quyền: thử lại cũng vô ích
+                log(f"[THÔNG BÁO] Không có quyền gửi tới {key[0]} {key[1]}: {e}")
+                break
+            except discord.NotFound as e:
+                if key[0] == "user" and self.user_cache is not None:
+                    self.user_cache.invalidate(key[1])
+                log(f"[THÔNG BÁO] Không tìm thấy {key[0]} {key[1]}: {e}")
+                break
+            except discord.HTTPException as e:
+                retry_after, remaining = self._rate_limit_info(e)
+                if e.status == 429:
+                    # bucket.reserve() ở lượt sau đã chờ hết Retry-After
+                    bucket.block_for(retry_after or 1.0, remaining)
+                    delay = 0
+                elif e.status < 500:
+                    log(f"[THÔNG BÁO] Discord từ chối tin gửi tới {key[0]} {key[1]}: {e}")
+                    break
+                else:
+                    delay = retry_after or (2 ** attempt + random.random())
+            except (OSError, asyncio.TimeoutError):
+                delay = 2 ** attempt + random.random()
+            if attempt < self.max_retries:
+                self.stats["retried"] += 1
+                await asyncio.sleep(delay)
+        self.stats["failed"] += 1
+        log(f"[THÔNG BÁO] Không gửi được {len(payloads) - sent} tin tới {key[0]} {key[1]}")
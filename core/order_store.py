@@ -0,0 +1,310 @@
+import os, json, sqlite3, threading, heapq
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Tuple
+from .logger import log
+
+class OrderRepository(ABC):
+    """Giao diện lưu trữ đơn hàng"""
+
+    @abstractmethod
+    def load_all(self) -> Dict[str, dict]:
+        ...
+
+    @abstractmethod
+    def upsert(self, orders: Dict[str, dict], order_ids):
+        """Ghi lại các đơn đã thay đổi (đơn không còn trong orders sẽ bị xóa)"""
+
+    @abstractmethod
+    def save_all(self, orders: Dict[str, dict]):
+        ...
+
+    def count_by_status(self, orders: Dict[str, dict]) -> Dict[str, int]:
+        counts = {}
+        for o in orders.values():
+            counts[o.get("trang_thai")] = counts.get(o.get("trang_thai"), 0) + 1
+        return counts
+
+    def list_ids(self, orders: Dict[str, dict], trang_thai: Optional[str] = None,
+                 limit: int = 10) -> List[str]:
+        matched = (mid for mid, o in orders.items()
+                   if trang_thai is None or o.get("trang_thai") == trang_thai)
+        return heapq.nlargest(limit, matched, key=lambda mid: orders[mid].get("thoi_gian_ts") or 0)
+
+    def ids_by_field(self, orders: Dict[str, dict], field: str, value) -> List[str]:
+        return [mid for mid, o in orders.items() if o.get(field) == value]
+
+    def compact(self, orders: Dict[str, dict], background: bool = True):
+        """Dọn dẹp file lưu trữ; background=True thì chạy trong thread riêng"""
+
+    def close(self):
+        pass
+
+
+class JsonJournalRepository(OrderRepository):
+    """orders.json làm snapshot + orders.journal chứa các bản ghi delta"""
+
+    # Số bản ghi journal tối đa trước khi gộp lại thành snapshot
+    COMPACT_THRESHOLD = 500
+
+    def __init__(self, order_file: str = "orders.json"):
+        self.order_file = order_file
+        self.journal_file = os.path.splitext(order_file)[0] + ".journal"
+        self._journal_records = 0
+        self._compact_lock = threading.Lock()
+
+    def load_all(self) -> Dict[str, dict]:
+        orders = {}
+        if os.path.exists(self.order_file):
+            try:
+                with open(self.order_file, "r", encoding="utf-8") as f:
+                    orders = json.load(f)
+            except json.JSONDecodeError:
+                log(f"⚠️ Lỗi đọc {self.order_file}, khởi tạo lại dữ liệu")
+                orders = {}
+        # Journal cũ (đang gộp dở) rồi đến journal hiện tại
+        self._replay(self.journal_file + ".old", orders)
+        self._replay(self.journal_file, orders)
+        return orders
+
+    def _replay(self, path: str, orders: Dict[str, dict]):
+        """Áp các bản ghi delta trong journal lên orders"""
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dòng cuối có thể bị cắt ngang khi bot tắt đột ngột
+                    log(f"⚠️ Bỏ qua bản ghi hỏng trong {path}")
+                    continue
+                if rec.get("op") == "del":
+                    orders.pop(rec["id"], None)
+                else:
+                    orders[rec["id"]] = rec["data"]
+                self._journal_records += 1
+
+    def upsert(self, orders: Dict[str, dict], order_ids):
+        with open(self.journal_file, "a", encoding="utf-8") as f:
+            for oid in order_ids:
+                if oid in orders:
+                    rec = {"op": "set", "id": oid, "data": orders[oid]}
+                else:
+                    rec = {"op": "del", "id": oid}
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                self._journal_records += 1
+        if self._journal_records >= self.COMPACT_THRESHOLD:
+            self.compact(orders)
+
+    def save_all(self, orders: Dict[str, dict]):
+        self.compact(orders, background=False)
+
+    def _write_snapshot(self, snapshot: Dict[str, dict]):
+        """Ghi snapshot ra file tạm rồi thay thế nguyên tử"""
+        try:
+            data = json.dumps(snapshot, indent=4, ensure_ascii=False)
+            tmp = self.order_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.order_file)
+            # Snapshot đã chứa mọi thay đổi của journal cũ
+            if os.path.exists(self.journal_file + ".old"):
+                os.remove(self.journal_file + ".old")
+        except Exception as e:
+            log(f"[LỖI] Không thể gộp journal đơn hàng: {e}")
+        finally:
+            self._compact_lock.release()
+
+    def compact(self, orders: Dict[str, dict], background: bool = True):
+        """Gộp journal vào snapshot"""
+        if not self._compact_lock.acquire(blocking=not background):
+            return  # Đang có lượt gộp khác chạy
+        try:
+            # Xoay journal để các thay đổi mới ghi vào file mới trong lúc gộp
+            if os.path.exists(self.journal_file) and not os.path.exists(self.journal_file + ".old"):
+                os.replace(self.journal_file, self.journal_file + ".old")
+            # Chỉ chép nông từng đơn ở đây; json.dumps và ghi file chạy trong thread
+            snapshot = {oid: dict(o) for oid, o in orders.items()}
+            self._journal_records = 0
+        except Exception:
+            self._compact_lock.release()
+            raise
+        if background:
+            threading.Thread(target=self._write_snapshot, args=(snapshot,), daemon=True).start()
+        else:
+            self._write_snapshot(snapshot)
+
+
+class SQLiteOrderRepository(OrderRepository):
+    """Lưu đơn hàng trong SQLite (WAL) với index cho các truy vấn thường dùng"""
+
+    SCHEMA_VERSION = 2
+
+    def __init__(self, db_file: str = "orders.db"):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(db_file, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version == 1:
+            # v1 -> v2: sắp xếp/so sánh thời gian bằng epoch thay vì chuỗi
+            self.conn.executescript("""
+                ALTER TABLE orders ADD COLUMN thoi_gian_ts REAL;
+                ALTER TABLE orders ADD COLUMN thoi_han_ts REAL;
+                DROP INDEX IF EXISTS idx_orders_thoi_gian;
+                DROP INDEX IF EXISTS idx_orders_thoi_han;
+            """)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS orders (
+                id            TEXT PRIMARY KEY,
+                trang_thai    TEXT,
+                user_id       INTEGER,
+                nguoi_nhan_id INTEGER,
+                thoi_gian     TEXT,
+                thoi_han      TEXT,
+                data          TEXT NOT NULL,
+                thoi_gian_ts  REAL,
+                thoi_han_ts   REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_orders_trang_thai    ON orders(trang_thai);
+            CREATE INDEX IF NOT EXISTS idx_orders_user_id       ON orders(user_id);
+            CREATE INDEX IF NOT EXISTS idx_orders_nguoi_nhan_id ON orders(nguoi_nhan_id);
+            CREATE INDEX IF NOT EXISTS idx_orders_thoi_gian_ts  ON orders(thoi_gian_ts);
+            CREATE INDEX IF NOT EXISTS idx_orders_thoi_han_ts   ON orders(thoi_han_ts);
+        """)
+        self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def is_empty(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM orders LIMIT 1").fetchone() is None
+
+    def load_all(self) -> Dict[str, dict]:
+        return {oid: json.loads(data) for oid, data in self.conn.execute("SELECT id, data FROM orders")}
+
+    @staticmethod
+    def _row(oid: str, o: dict) -> Tuple:
+        return (oid, o.get("trang_thai"), o.get("user_id"), o.get("nguoi_nhan_id"),
+                o.get("thoi_gian"), o.get("thoi_han"), json.dumps(o, ensure_ascii=False),
+                o.get("thoi_gian_ts"), o.get("thoi_han_ts"))
+
+    def upsert(self, orders: Dict[str, dict], order_ids):
+        rows = [self._row(oid, orders[oid]) for oid in order_ids if oid in orders]
+        deleted = [(oid,) for oid in order_ids if oid not in orders]
+        with self.conn:
+            self.conn.execute("BEGIN")
+            if rows:
+                self.conn.executemany("INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            if deleted:
+                self.conn.executemany("DELETE FROM orders WHERE id = ?", deleted)
+
+    def save_all(self, orders: Dict[str, dict]):
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.execute("DELETE FROM orders")
+            self.conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  [self._row(oid, o) for oid, o in orders.items()])
+
+    def count_by_status(self, orders: Dict[str, dict]) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT trang_thai, COUNT(*) FROM orders GROUP BY trang_thai"))
+
+    def list_ids(self, orders: Dict[str, dict], trang_thai: Optional[str] = None,
+                 limit: int = 10) -> List[str]:
+        if trang_thai is None:
+            cur = self.conn.execute("SELECT id FROM orders ORDER BY thoi_gian_ts DESC LIMIT ?", (limit,))
+        else:
+            cur = self.conn.execute(
+                "SELECT id FROM orders WHERE trang_thai = ? ORDER BY thoi_gian_ts DESC LIMIT ?",
+                (trang_thai, limit))
+        return [oid for (oid,) in cur]
+
+    def ids_by_field(self, orders: Dict[str, dict], field: str, value) -> List[str]:
+        if field not in ("trang_thai", "user_id", "nguoi_nhan_id"):
+            return super().ids_by_field(orders, field, value)
+        return [oid for (oid,) in self.conn.execute(f"SELECT id FROM orders WHERE {field} = ?", (value,))]
+
+    def _checkpoint(self):
+        try:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            log(f"[LỖI] Không thể checkpoint {self.db_file}: {e}")
+
+    def compact(self, orders: Dict[str, dict], background: bool = True):
+        """Gộp WAL vào file database"""
+        if background:
+            threading.Thread(target=self._checkpoint, daemon=True).start()
+        else:
+            self._checkpoint()
+
+    def close(self):
+        self.conn.close()
+
+
+class OrderStore(MutableMapping):
+    """Facade dạng dict cho đơn hàng, dữ liệu được ghi xuống repository"""
+
+    def __init__(self, repo: OrderRepository, data: Optional[Dict[str, dict]] = None):
+        self.repo = repo
+        self._data = repo.load_all() if data is None else data
+
+    def __getitem__(self, order_id: str) -> dict:
+        return self._data[order_id]
+
+    def __setitem__(self, order_id: str, order: dict):
+        self._data[order_id] = order
+        self.repo.upsert(self._data, (order_id,))
+
+    def __delitem__(self, order_id: str):
+        del self._data[order_id]
+        self.repo.upsert(self._data, (order_id,))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, order_id) -> bool:
+        return order_id in self._data
+
+    def save(self, *order_ids: str):
+        """Ghi lại các đơn đã sửa tại chỗ; không truyền mã đơn thì ghi toàn bộ"""
+        if order_ids:
+            self.repo.upsert(self._data, order_ids)
+        else:
+            self.repo.save_all(self._data)
+
+    def count_by_status(self) -> Dict[str, int]:
+        return self.repo.count_by_status(self._data)
+
+    def list_orders(self, trang_thai: Optional[str] = None, limit: int = 10) -> List[Tuple[str, dict]]:
+        """Các đơn mới nhất theo thời gian đặt, lọc theo trạng thái nếu có"""
+        return [(oid, self._data[oid]) for oid in self.repo.list_ids(self._data, trang_thai, limit)
+                if oid in self._data]
+
+    def by_user(self, user_id) -> List[Tuple[str, dict]]:
+        return [(oid, self._data[oid]) for oid in self.repo.ids_by_field(self._data, "user_id", user_id)]
+
+    def compact(self, background: bool = True):
+        self.repo.compact(self._data, background)
+
+    def export_json(self, path: str):
+        """Xuất toàn bộ đơn ra file JSON (cùng định dạng orders.json)"""
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def import_json(self, path: str) -> int:
+        """Nhập đơn từ file JSON/journal, ghi đè các đơn trùng mã"""
+        imported = JsonJournalRepository(path).load_all()
+        self._data.update(imported)
+        self.repo.upsert(self._data, list(imported))
+        return len(imported)
@@ -1,23 +1,47 @@
-import os, json, uuid
+import os, uuid
 from .logger import log
+from .config import load_config
+from .order_store import OrderStore, JsonJournalRepository, SQLiteOrderRepository
+from .time_utils import ensure_order_timestamps
 
 order_file = "orders.json"
-orders = {}
-if os.path.exists(order_file):
-    try:
-        with open(order_file, "r", encoding="utf-8") as f:
-            orders = json.load(f)
-    except json.JSONDecodeError:
-        log("⚠️ Lỗi đọc orders.json, khởi tạo lại dữ liệu")
-        orders = {}
+order_db = "orders.db"
 
-for o in orders.values():
+def _open_repository():
+    """Chọn backend lưu đơn theo ORDER_BACKEND trong config (sqlite/json)"""
+    backend = str(load_config().get("ORDER_BACKEND", "sqlite")).lower()
+    if backend == "json":
+        return JsonJournalRepository(order_file), None
+    repo = SQLiteOrderRepository(order_db)
+    legacy = None
+    if repo.is_empty() and (os.path.exists(order_file) or os.path.exists("orders.journal")):
+        # Lần đầu chuyển sang SQLite: nhập dữ liệu cũ từ orders.json
+        legacy = JsonJournalRepository(order_file).load_all()
+        if legacy:
+            repo.save_all(legacy)
+            log(f"📦 Đã nhập {len(legacy)} đơn từ {order_file} vào {order_db}")
+    return repo, legacy
+
+_repo, _legacy = _open_repository()
+orders = OrderStore(_repo, _legacy)
+
+_backfilled = []
+for _mid, o in orders.items():
     o.setdefault("da_nhac_het_gio", False)
     o.setdefault("qua_han", False)
+    # Đơn cũ chưa có timestamp dạng số
+    if ensure_order_timestamps(o):
+        _backfilled.append(_mid)
+if _backfilled:
+    orders.save(*_backfilled)
+
+def save_orders(*order_ids: str):
+    """Ghi nhận thay đổi của các đơn; không truyền mã đơn thì ghi lại toàn bộ"""
+    orders.save(*order_ids)
 
-def save_orders():
-    with open(order_file, "w", encoding="utf-8") as f:
-        json.dump(orders, f, indent=4, ensure_ascii=False)
+def export_orders(path: str = order_file):
+    """Xuất đơn hàng ra JSON để sao lưu/chuyển backend"""
+    orders.export_json(path)
 
 def generate_order_id() -> str:
     return str(uuid.uuid4())[:8]
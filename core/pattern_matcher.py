@@ -0,0 +1,62 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+class PatternMatcher:
+    """Bảng pattern đã biên dịch.
+
+    Mỗi pattern dạng "hi|hello|hey" được tách thành các nhánh; khớp chính xác
+    tra thẳng trong dict, khớp gần đúng (Jaccard theo từ) chỉ xét các nhánh
+    có chung token với câu hỏi qua index token -> nhánh.
+    """
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self._exact: Dict[str, str] = {}
+        self._token_index: Dict[str, List[int]] = {}
+        self._alternatives: List[Tuple[str, int]] = []  # (pattern, số token)
+        self._patterns = set()
+        for pattern in patterns:
+            self.add(pattern)
+
+    @staticmethod
+    def _tokens(text: str) -> frozenset:
+        return frozenset(text.lower().split())
+
+    def add(self, pattern: str):
+        """Đăng ký pattern mới; pattern đã có thì bỏ qua (nhánh chỉ phụ thuộc vào key)"""
+        if pattern in self._patterns:
+            return
+        self._patterns.add(pattern)
+        for alternative in pattern.split("|"):
+            tokens = self._tokens(alternative)
+            if not tokens:
+                continue
+            # Pattern thêm trước được ưu tiên, giống thứ tự duyệt dict cũ
+            self._exact.setdefault(" ".join(alternative.lower().split()), pattern)
+            alt_id = len(self._alternatives)
+            self._alternatives.append((pattern, len(tokens)))
+            for token in tokens:
+                self._token_index.setdefault(token, []).append(alt_id)
+
+    def match_exact(self, text: str) -> Optional[str]:
+        return self._exact.get(" ".join(text.lower().split()))
+
+    def match_fuzzy(self, text: str, threshold: float = 0.8) -> Tuple[Optional[str], float]:
+        """Pattern có nhánh giống câu hỏi nhất (Jaccard > threshold)"""
+        tokens = self._tokens(text)
+        if not tokens:
+            return None, 0.0
+        overlap: Dict[int, int] = {}
+        for token in tokens:
+            for alt_id in self._token_index.get(token, ()):
+                overlap[alt_id] = overlap.get(alt_id, 0) + 1
+
+        best_pattern, best_score = None, 0.0
+        for alt_id in sorted(overlap):
+            shared = overlap[alt_id]
+            pattern, size = self._alternatives[alt_id]
+            score = shared / (size + len(tokens) - shared)
+            if score > threshold and score > best_score:
+                best_pattern, best_score = pattern, score
+        return best_pattern, best_score
+
+    def __len__(self) -> int:
+        return len(self._patterns)
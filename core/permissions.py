@@ -1,23 +1,125 @@
-import functools
-from typing import Callable, List, Union
+import functools, json, os
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Union
 import discord
+from .config import load_config
+from .logger import log
+
+PERMISSIONS_FILE = os.path.join("data", "permissions.json")
+
+# Thứ tự từ cao xuống thấp, dùng cho get_permission_level
+PERMISSION_NAMES = ("ADMIN", "MODERATOR", "WORKER")
+PERMISSION_BITS = {name: 1 << i for i, name in enumerate(PERMISSION_NAMES)}
+
+def _load_roles() -> Dict[str, List[int]]:
+    """Danh sách role id cho từng quyền: data/permissions.json, chưa có thì lấy ROLES trong config"""
+    configured = load_config().get("ROLES", {})
+    if os.path.exists(PERMISSIONS_FILE):
+        try:
+            with open(PERMISSIONS_FILE, "r", encoding="utf-8") as f:
+                configured = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log(f"[LỖI] Không đọc được {PERMISSIONS_FILE}, dùng ROLES trong config: {e}")
+    return {name: [int(rid) for rid in configured.get(name, ())] for name in PERMISSION_NAMES}
+
+def _save_roles(roles: Dict[str, List[int]]):
+    """Ghi bảng quyền ra file tạm rồi thay thế nguyên tử"""
+    os.makedirs(os.path.dirname(PERMISSIONS_FILE), exist_ok=True)
+    tmp = PERMISSIONS_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(roles, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, PERMISSIONS_FILE)
+
+ROLES = _load_roles()
+
+def permission_mask(names: Union[str, Iterable[str]]) -> int:
+    if isinstance(names, str):
+        names = [names]
+    mask = 0
+    for name in names:
+        mask |= PERMISSION_BITS.get(name, 0)
+    return mask
+
+class PermissionIndex:
+    """Bảng role id -> bitmask quyền, kèm cache theo bộ role của member"""
+
+    def __init__(self, roles: Dict[str, List[int]], cache_size: int = 1024):
+        self.cache_size = cache_size
+        self._role_masks: Dict[int, int] = {}
+        self._member_masks: "OrderedDict[tuple, int]" = OrderedDict()
+        self.rebuild(roles)
+
+    def rebuild(self, roles: Dict[str, List[int]]):
+        """Tính lại bảng sau khi ROLES thay đổi (/phanquyen)"""
+        role_masks: Dict[int, int] = {}
+        for name, role_ids in roles.items():
+            bit = PERMISSION_BITS.get(name, 0)
+            for rid in role_ids:
+                role_masks[rid] = role_masks.get(rid, 0) | bit
+        self._role_masks = role_masks
+        self._member_masks = OrderedDict()
+
+    def mask_for(self, member) -> int:
+        key = tuple(role.id for role in getattr(member, "roles", ()))
+        mask = self._member_masks.get(key)
+        if mask is not None:
+            self._member_masks.move_to_end(key)
+            return mask
+        mask = 0
+        for rid in key:
+            mask |= self._role_masks.get(rid, 0)
+        self._member_masks[key] = mask
+        if len(self._member_masks) > self.cache_size:
+            self._member_masks.popitem(last=False)
+        return mask
+
+    def has(self, member, names: Union[str, Iterable[str]]) -> bool:
+        return bool(self.mask_for(member) & permission_mask(names))
+
+    def level(self, member) -> str:
+        mask = self.mask_for(member)
+        for name in PERMISSION_NAMES:
+            if mask & PERMISSION_BITS[name]:
+                return name
+        return "ALL"
+
+permission_index = PermissionIndex(ROLES)
+
+def update_role(name: str, role_id: int, add: bool):
+    """Thêm/bỏ role khỏi một quyền, ghi xuống đĩa rồi mới cập nhật index"""
+    role_ids = ROLES[name]
+    previous = list(role_ids)
+    if add:
+        role_ids.append(role_id)
+    else:
+        role_ids.remove(role_id)
+    try:
+        _save_roles(ROLES)
+    except OSError:
+        role_ids[:] = previous
+        raise
+    permission_index.rebuild(ROLES)
 
 def requires_role(roles: Union[str, List[str]]):
     """Decorator để kiểm tra role cho slash commands"""
     if isinstance(roles, str):
         roles = [roles]
-    
+    required = permission_mask(roles)
+
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
-        async def wrapper(self, interaction: discord.Interaction, *args, **kwargs):
-            member = interaction.user
-            if not any(self.bot.has_role(member, role) for role in roles):
+        async def wrapper(*args, **kwargs):
+            # Lệnh trong cog có self đứng trước interaction
+            interaction = args[0] if isinstance(args[0], discord.Interaction) else args[1]
+            if not permission_index.mask_for(interaction.user) & required:
                 role_names = ", ".join(roles)
                 await interaction.response.send_message(
                     f"❌ Bạn cần role {role_names} để sử dụng lệnh này.",
                     ephemeral=True
                 )
                 return
-            return await func(self, interaction, *args, **kwargs)
+            return await func(*args, **kwargs)
         return wrapper
     return decorator
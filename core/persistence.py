@@ -0,0 +1,82 @@
+import atexit
+import os
+import threading
+import time
+from typing import Callable
+from .logger import log
+
+class DebouncedWriter:
+    """Ghi file kiểu write-behind.
+
+    mark_dirty() chỉ đánh dấu; thread nền gộp mọi thay đổi trong `interval`
+    giây thành một lần ghi (file tạm + fsync + os.replace). flush() ghi ngay,
+    được gọi khi tắt bot và qua atexit.
+    """
+
+    def __init__(self, path: str, serialize: Callable[[], str], interval: float = 5.0):
+        self.path = path
+        self.serialize = serialize
+        self.interval = interval
+        self.writes = 0
+        self._dirty = False
+        self._dirty_since = 0.0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name=f"writer:{os.path.basename(path)}")
+        self._thread.start()
+        atexit.register(self.close)
+
+    def mark_dirty(self):
+        with self._cond:
+            if not self._dirty:
+                self._dirty = True
+                self._dirty_since = time.monotonic()
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                delay = self._dirty_since + self.interval - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+            self.flush()
+
+    def flush(self) -> bool:
+        """Ghi ngay nếu có thay đổi chưa lưu"""
+        with self._write_lock:
+            with self._cond:
+                if not self._dirty:
+                    return True
+                self._dirty = False
+            try:
+                data = self.serialize()
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+                self.writes += 1
+                return True
+            except Exception as e:
+                log(f"[LỖI] Không ghi được {self.path}: {e}")
+                # Giữ trạng thái dirty để thử lại ở lượt sau
+                self.mark_dirty()
+                return False
+
+    def close(self):
+        """Dừng thread nền sau khi ghi nốt thay đổi"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
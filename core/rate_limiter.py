@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Hashable, List, Optional
+
+class SlidingWindowLimiter:
+    """Tối đa `limit` sự kiện trong `window` giây cho mỗi key (deque timestamp)"""
+
+    def __init__(self, limit: int, window: float = 60.0, max_keys: int = 10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._events: "OrderedDict[Hashable, deque]" = OrderedDict()
+
+    def _purge(self, key: Hashable, now: float) -> deque:
+        events = self._events.get(key)
+        if events is None:
+            events = self._events[key] = deque()
+            if len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+        else:
+            self._events.move_to_end(key)
+        cutoff = now - self.window
+        while events and events[0] <= cutoff:
+            events.popleft()
+        return events
+
+    def allowed(self, key: Hashable, now: float) -> bool:
+        return len(self._purge(key, now)) < self.limit
+
+    def record(self, key: Hashable, now: float):
+        self._purge(key, now).append(now)
+
+    def state(self, now: float) -> List:
+        """Các sự kiện còn trong cửa sổ dạng [[key, [timestamp, ...]], ...] (lưu được ra JSON)"""
+        cutoff = now - self.window
+        return [[key, [t for t in events if t > cutoff]]
+                for key, events in self._events.items() if events and events[-1] > cutoff]
+
+    def load_state(self, state: List):
+        for key, timestamps in state:
+            self._events[key] = deque(sorted(timestamps))
+            if len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+
+class LearnRateLimiter:
+    """Giới hạn số lần học theo toàn cục, từng user và từng guild.
+
+    Mỗi lần kiểm tra là O(1) khấu hao; chỉ ghi nhận khi mọi giới hạn đều cho phép.
+    Giới hạn bằng None thì bỏ qua. Thời điểm tính theo time.time() để state()
+    lưu lại được và vẫn đúng sau khi khởi động lại bot.
+    """
+
+    def __init__(self, global_limit: Optional[int] = 10, user_limit: Optional[int] = None,
+                 guild_limit: Optional[int] = None, window: float = 60.0):
+        self._limiters = []
+        if global_limit:
+            self._limiters.append(("global", SlidingWindowLimiter(global_limit, window)))
+        if user_limit:
+            self._limiters.append(("user", SlidingWindowLimiter(user_limit, window)))
+        if guild_limit:
+            self._limiters.append(("guild", SlidingWindowLimiter(guild_limit, window)))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> "LearnRateLimiter":
+        """Đọc AI_LEARN_RATE_LIMIT {"global", "user", "guild", "window"} từ config"""
+        settings = config.get("AI_LEARN_RATE_LIMIT", {})
+        return cls(settings.get("global", 10), settings.get("user"),
+                   settings.get("guild"), settings.get("window", 60.0))
+
+    def try_acquire(self, user_id=None, guild_id=None, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        keys = {"global": None, "user": user_id, "guild": guild_id}
+        with self._lock:
+            applicable = [(limiter, keys[scope]) for scope, limiter in self._limiters
+                          if scope == "global" or keys[scope] is not None]
+            if not all(limiter.allowed(key, now) for limiter, key in applicable):
+                return False
+            for limiter, key in applicable:
+                limiter.record(key, now)
+            return True
+
+    def state(self, now: Optional[float] = None) -> Dict[str, List]:
+        now = time.time() if now is None else now
+        with self._lock:
+            return {scope: limiter.state(now) for scope, limiter in self._limiters}
+
+    def load_state(self, state: Dict[str, List]):
+        """Nạp lại các sự kiện đã lưu bằng state()"""
+        with self._lock:
+            for scope, limiter in self._limiters:
+                limiter.load_state(state.get(scope, []))
@@ -0,0 +1,57 @@
+import re
+from typing import Iterable, Pattern
+
+def compile_alternation(patterns: Iterable[str], flags: int = 0) -> Pattern:
+    """Gộp một nhóm pattern thành một alternation "(?:a)|(?:b)|..." biên dịch một lần.
+
+    Mỗi pattern được bọc trong nhóm không bắt nên ^/$ vẫn áp dụng cho riêng
+    nhánh của nó; search() trả về kết quả khi bất kỳ nhánh nào khớp.
+    """
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), flags)
+
+# Nhận diện câu hỏi / câu trả lời (DataCollector)
+QUESTION_PATTERNS = (
+    r'\?$',
+    r'^(what|how|why|when|where|who|whose|which|will|can|could|làm sao|như thế nào|khi nào|bao giờ|ai|ở đâu|tại sao)',
+    r'(cho hỏi|xin hỏi|hỏi chút|tell me|explain)'
+)
+ANSWER_PATTERNS = (
+    r'^(here|này|đây|okay|ok|được|yes|yeah|uhm|à|ừ)',
+    r'(như sau|as follows|you can|bạn có thể|should|nên)',
+    r'(đúng vậy|chính xác|correct|right|true)'
+)
+QUESTION_RE = compile_alternation(QUESTION_PATTERNS)
+ANSWER_RE = compile_alternation(ANSWER_PATTERNS)
+
+# Thực thể trong tin nhắn (CaveStoreAI.extract_entities / extract_order_info).
+# Trích xuất cần mọi kết quả của từng nhánh, kể cả khi chồng lên nhau
+# ("2 ngày mai" -> "ngày mai" và "2 ngày") nên mỗi nhánh biên dịch riêng
+# thay vì gộp thành một alternation.
+ITEM_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'sl|rp|silver lions|research points',
+    r'xe|vehicle|tank|plane',
+    r'premium|event'
+))
+TIME_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'hôm nay|ngày mai|tuần sau|tháng sau',
+    r'\d+\s*(?:ngày|tuần|tháng|năm)',
+    r'sáng|trưa|chiều|tối'
+))
+NUMBER_RE = re.compile(r'\d+(?:,\d{3})*(?:\.\d+)?')
+CURRENCY_RE = re.compile(r'vnd|đồng|vnđ|\$|usd', re.IGNORECASE)
+ORDER_ITEM_RE = re.compile(r'(sl|rp|premium|vehicle|tank|plane)')
+ORDER_QUANTITY_RE = re.compile(r'(\d+)\s*(cái|individual|item|cai)')
+ORDER_ID_RE = re.compile(r'[A-Z0-9]{8}')
+
+# Trích xuất dữ liệu từ trang web (WebDataCollector)
+WEB_PATTERNS = {
+    'price': re.compile(r'(\d+[.,]?\d*)\s*(GJN|USD|EUR|₽|VND|₫)'),
+    'vehicle_name': re.compile(r'([A-Z][A-Za-z0-9-_]+(?:\s+[A-Za-z0-9-_]+)*)'),
+    'br_rating': re.compile(r'BR\s*(\d+\.\d+|\d+)'),
+    'repair_cost': re.compile(r'Repair cost:?\s*(\d+[.,]?\d*)'),
+    'modification': re.compile(r'Modification cost:?\s*(\d+[.,]?\d*)'),
+    # Dùng để tìm node text trong BeautifulSoup
+    'br_text': re.compile(r'BR\s*\d'),
+    'repair_text': re.compile(r'Repair cost'),
+    'cost_text': re.compile(r'cost:?\s*\d')
+}
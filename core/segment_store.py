@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from .logger import log
+
+class SegmentStore:
+    """Lưu bản ghi dạng JSONL chỉ-ghi-thêm, chia segment theo luồng (stream) và theo ngày.
+
+    File nằm ở <root>/<stream>/<YYYY-MM-DD>.<n>.jsonl; sang ngày mới hoặc file
+    vượt `max_segment_bytes` thì mở segment mới. append() chỉ đưa vào bộ đệm,
+    flush() ghi nối bộ đệm vào cuối segment nên chi phí tỉ lệ với số bản ghi mới.
+    """
+
+    def __init__(self, root: str, max_segment_bytes: int = 4 * 1024 * 1024):
+        self.root = root
+        self.max_segment_bytes = max_segment_bytes
+        self._buffers: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        self._current: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def append(self, stream: str, record: Dict, day: Optional[str] = None):
+        """Thêm một bản ghi vào bộ đệm (day mặc định là hôm nay)"""
+        day = day or datetime.now().strftime("%Y-%m-%d")
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._buffers[(stream, day)].append(line)
+
+    def _segment_path(self, stream: str, day: str) -> str:
+        path = self._current.get((stream, day))
+        if path is None:
+            existing = [name for name in self._segment_names(stream) if name.startswith(day + ".")]
+            path = os.path.join(self.root, stream, existing[-1] if existing else f"{day}.0000.jsonl")
+        if os.path.exists(path) and os.path.getsize(path) >= self.max_segment_bytes:
+            number = int(os.path.basename(path).split(".")[1]) + 1
+            path = os.path.join(self.root, stream, f"{day}.{number:04d}.jsonl")
+        self._current[(stream, day)] = path
+        return path
+
+    def flush(self) -> bool:
+        """Ghi nối các bản ghi trong bộ đệm xuống segment"""
+        with self._write_lock:
+            with self._lock:
+                buffers, self._buffers = self._buffers, defaultdict(list)
+            ok = True
+            for (stream, day), lines in buffers.items():
+                try:
+                    os.makedirs(os.path.join(self.root, stream), exist_ok=True)
+                    with open(self._segment_path(stream, day), "a", encoding="utf-8") as f:
+                        f.write("\n".join(lines) + "\n")
+                except OSError as e:
+                    log(f"[LỖI] Không ghi được segment {stream}/{day}: {e}")
+                    # Đưa lại vào đầu bộ đệm để lần flush sau thử lại
+                    with self._lock:
+                        self._buffers[(stream, day)][:0] = lines
+                    ok = False
+            return ok
+
+    def _segment_names(self, stream: str) -> List[str]:
+        directory = os.path.join(self.root, stream)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name for name in os.listdir(directory) if name.endswith(".jsonl"))
+
+    def segments(self, stream: str, since: Optional[str] = None) -> List[str]:
+        """Đường dẫn các segment theo thứ tự thời gian (since: ngày YYYY-MM-DD)"""
+        return [os.path.join(self.root, stream, name) for name in self._segment_names(stream)
+                if since is None or name[:10] >= since]
+
+    def read(self, stream: str, since: Optional[str] = None) -> Iterator[Dict]:
+        """Đọc lần lượt từng bản ghi, cũ trước (không nạp cả luồng vào bộ nhớ)"""
+        self.flush()
+        for path in self.segments(stream, since):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Dòng ghi dở khi bot bị tắt đột ngột
+                        continue
+
+    def streams(self, prefix: str = "") -> List[str]:
+        """Tên các luồng con nằm dưới `prefix` (vd. "topics")"""
+        directory = os.path.join(self.root, prefix)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name for name in os.listdir(directory)
+                      if os.path.isdir(os.path.join(directory, name)))
@@ -9,6 +9,7 @@ import time
 import gc
 from collections import defaultdict
 from functools import lru_cache
+from .sparse_matrix import SparseSetMatrix
 
 class SmartResponseGenerator:
     def __init__(self):
@@ -23,6 +24,10 @@ class SmartResponseGenerator:
         self._last_data_load = 0
         self.data_reload_interval = 300
         
+        # Ma trận token của các câu hỏi đã lưu, dựng lại khi danh sách đổi
+        self._question_matrix = SparseSetMatrix()
+        self._matrix_source = None
+        
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """Calculate simple text similarity"""
         # Convert to sets of words
@@ -285,6 +290,16 @@ class SmartResponseGenerator:
             for user_id, _ in sorted_users[:-self.max_users]:
                 del self.context_history[user_id]
 
+    def _questions_matrix(self) -> SparseSetMatrix:
+        """Ma trận token của data['responses'], chỉ thêm các câu hỏi mới"""
+        responses = self.data['responses']
+        if responses is not self._matrix_source or len(responses) < len(self._question_matrix):
+            self._question_matrix = SparseSetMatrix()
+            self._matrix_source = responses
+        for resp in responses[len(self._question_matrix):]:
+            self._question_matrix.add_row(resp['question'].lower().split())
+        return self._question_matrix
+
     def find_best_response(self,
                           message: str,
                           user_id: str,
@@ -298,39 +313,13 @@ class SmartResponseGenerator:
         context['user_id'] = user_id
         context['timestamp'] = time.time()
         
-        # Tối ưu tìm kiếm câu trả lời
+        # Jaccard với mọi câu hỏi đã lưu trong một lần tính (NumPy)
         best_similarity = 0
         best_response = None
-        
-        # Batch processing để giảm memory usage
-        batch_size = 50
-        responses = self.data['responses']
-        
-        for i in range(0, len(responses), batch_size):
-            batch = responses[i:i + batch_size]
-            
-            # Process similarity in batch
-            batch_similarities = [
-                (
-                    self.get_semantic_similarity_cached(message, resp['question']),
-                    resp
-                )
-                for resp in batch
-            ]
-            
-            # Update best match
-            batch_best = max(batch_similarities, key=lambda x: x[0])
-            if batch_best[0] > best_similarity:
-                best_similarity = batch_best[0]
-                best_response = batch_best[1]
-            
-            # Early stopping if we found a very good match
-            if best_similarity > 0.9:
-                break
-                
-            # Garbage collection for large batches
-            if i % (batch_size * 5) == 0:
-                gc.collect()
+        top = self._questions_matrix().top_k(message.lower().split(), k=1)
+        if top and top[0][1] > 0:
+            best_similarity = top[0][1]
+            best_response = self.data['responses'][top[0][0]]
         
         if not best_response or best_similarity < 0.6:
             # Không tìm thấy câu trả lời phù hợp
@@ -345,10 +334,6 @@ class SmartResponseGenerator:
                             additional_data
                         )
                         
-                        # Clear cache periodically
-                        if random.random() < 0.1:  # 10% chance to clear cache
-                            self.get_semantic_similarity_cached.cache_clear()
-                            
                         return response, 0.5
                         
             # Fallback response
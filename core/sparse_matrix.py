@@ -0,0 +1,91 @@
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+class SparseSetMatrix:
+    """Ma trận thưa các tập token (mỗi hàng là một tập), tính Jaccard hàng loạt.
+
+    Lưu danh sách hàng theo từng token (postings) và độ dài mỗi hàng dạng mảng
+    NumPy; giao của câu hỏi với mọi hàng được đếm trong một lần np.unique trên
+    các postings của token trong câu hỏi, không duyệt từng cặp. Mỗi posting là
+    một buffer NumPy tăng dung lượng gấp đôi khi đầy, thêm hàng chỉ ghi nối tại
+    chỗ; đọc dùng view [:n] nên không phải dựng lại mảng.
+    """
+
+    def __init__(self, rows: Iterable[Iterable[str]] = ()):
+        self.vocab: Dict[str, int] = {}
+        self._postings: List[np.ndarray] = []
+        self._posting_sizes: List[int] = []
+        self._lengths = np.zeros(64, dtype=np.int32)
+        self._n_rows = 0
+        for row in rows:
+            self.add_row(row)
+
+    def __len__(self) -> int:
+        return self._n_rows
+
+    def add_row(self, tokens: Iterable[str]) -> int:
+        """Thêm một hàng, trả về chỉ số hàng"""
+        row = self._n_rows
+        token_set = set(tokens)
+        for token in token_set:
+            tid = self.vocab.get(token)
+            if tid is None:
+                tid = self.vocab[token] = len(self._postings)
+                self._postings.append(np.empty(4, dtype=np.int64))
+                self._posting_sizes.append(0)
+            size = self._posting_sizes[tid]
+            if size >= len(self._postings[tid]):
+                self._postings[tid] = np.resize(self._postings[tid], size * 2)
+            self._postings[tid][size] = row
+            self._posting_sizes[tid] = size + 1
+        if row >= len(self._lengths):
+            self._lengths = np.resize(self._lengths, len(self._lengths) * 2)
+        self._lengths[row] = len(token_set)
+        self._n_rows += 1
+        return row
+
+    def _posting_array(self, tid: int) -> np.ndarray:
+        return self._postings[tid][:self._posting_sizes[tid]]
+
+    def query(self, tokens: Iterable[str]) -> Tuple[List[np.ndarray], int, np.ndarray]:
+        """Chụp postings của câu hỏi (view [:n]) và mảng độ dài hàng.
+
+        Hàng đã thêm không bao giờ bị sửa nên kết quả dùng được với
+        jaccard_from() sau khi nhả khoá, dù add_row() vẫn đang chạy.
+        """
+        token_set = set(tokens)
+        arrays = [self._posting_array(self.vocab[t]) for t in token_set if t in self.vocab]
+        return arrays, len(token_set), self._lengths
+
+    @staticmethod
+    def _intersections(arrays: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        if not arrays:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(arrays), return_counts=True)
+
+    def intersections(self, tokens: Iterable[str]) -> Tuple[np.ndarray, np.ndarray, int]:
+        """(các hàng có chung token, số token chung, số token của câu hỏi)"""
+        arrays, size, _ = self.query(tokens)
+        rows, counts = self._intersections(arrays)
+        return rows, counts, size
+
+    @classmethod
+    def jaccard_from(cls, query: Tuple[List[np.ndarray], int, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Jaccard tính từ kết quả của query()"""
+        arrays, size, lengths = query
+        rows, shared = cls._intersections(arrays)
+        union = lengths[rows] + size - shared
+        return rows, shared / union
+
+    def jaccard(self, tokens: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Jaccard của câu hỏi với mọi hàng có chung token (các hàng khác = 0)"""
+        return self.jaccard_from(self.query(tokens))
+
+    def top_k(self, tokens: Iterable[str], k: int = 1) -> List[Tuple[int, float]]:
+        """k hàng giống nhất; bằng điểm thì hàng thêm trước đứng trước"""
+        rows, scores = self.jaccard(tokens)
+        if not len(rows):
+            return []
+        # rows đã tăng dần nên sort ổn định giữ thứ tự hàng khi bằng điểm
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(int(rows[i]), float(scores[i])) for i in order]
@@ -40,3 +40,30 @@ def format_deadline(hours: int) -> tuple[datetime, str]:
     """Tạo thời hạn từ số giờ"""
     deadline = datetime.now(timezone.utc) + timedelta(hours=hours)
     return deadline, deadline.strftime("%Y-%m-%d %H:%M:%S UTC")
+
+def parse_utc_timestamp(value: str) -> float:
+    """Đổi chuỗi "%Y-%m-%d %H:%M:%S UTC" sang epoch (không phụ thuộc locale như strptime)"""
+    value = value.strip()
+    if value.endswith(" UTC"):
+        value = value[:-4]
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+
+def from_timestamp(ts: float) -> datetime:
+    """Epoch -> datetime UTC"""
+    return datetime.fromtimestamp(ts, timezone.utc)
+
+def ensure_order_timestamps(order: dict) -> bool:
+    """Bổ sung thoi_gian_ts/thoi_han_ts cho đơn cũ, trả về True nếu có thay đổi"""
+    changed = False
+    for field in ("thoi_gian", "thoi_han"):
+        ts_field = f"{field}_ts"
+        if order.get(field) and order.get(ts_field) is None:
+            try:
+                order[ts_field] = parse_utc_timestamp(order[field])
+                changed = True
+            except ValueError:
+                pass
+        elif not order.get(field) and order.get(ts_field) is not None:
+            order[ts_field] = None
+            changed = True
+    return changed
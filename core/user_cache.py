@@ -0,0 +1,86 @@
+import time
+from collections import OrderedDict
+from typing import Dict
+
+class UserCache:
+    """Cache TTL + LRU cho discord.User và kênh DM.
+
+    Thứ tự tra cứu: bot.get_user (cache gateway) -> cache này -> REST fetch_user.
+    """
+
+    def __init__(self, bot, max_size: int = 1000, ttl: float = 3600):
+        self.bot = bot
+        self.max_size = max_size
+        self.ttl = ttl
+        self._users: "OrderedDict[int, tuple]" = OrderedDict()
+        self._dm_channels: "OrderedDict[int, tuple]" = OrderedDict()
+        self.stats = {
+            "gateway_hits": 0,
+            "hits": 0,
+            "misses": 0,
+            "dm_hits": 0,
+            "dm_misses": 0,
+        }
+
+    def _get(self, store: OrderedDict, key: int):
+        entry = store.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del store[key]
+            return None
+        store.move_to_end(key)
+        return value
+
+    def _put(self, store: OrderedDict, key: int, value):
+        store[key] = (time.monotonic() + self.ttl, value)
+        store.move_to_end(key)
+        while len(store) > self.max_size:
+            store.popitem(last=False)
+
+    async def get_user(self, user_id: int):
+        user_id = int(user_id)
+        user = self.bot.get_user(user_id)
+        if user is not None:
+            self.stats["gateway_hits"] += 1
+            return user
+        user = self._get(self._users, user_id)
+        if user is not None:
+            self.stats["hits"] += 1
+            return user
+        self.stats["misses"] += 1
+        user = await self.bot.fetch_user(user_id)
+        self._put(self._users, user_id, user)
+        return user
+
+    async def get_dm_channel(self, user_id: int):
+        """Kênh DM của user, chỉ gọi create_dm khi chưa có trong cache"""
+        user_id = int(user_id)
+        channel = self._get(self._dm_channels, user_id)
+        if channel is not None:
+            self.stats["dm_hits"] += 1
+            return channel
+        user = await self.get_user(user_id)
+        channel = user.dm_channel
+        if channel is None:
+            self.stats["dm_misses"] += 1
+            channel = await user.create_dm()
+        else:
+            self.stats["dm_hits"] += 1
+        self._put(self._dm_channels, user_id, channel)
+        return channel
+
+    def invalidate(self, user_id: int):
+        self._users.pop(int(user_id), None)
+        self._dm_channels.pop(int(user_id), None)
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["gateway_hits"] + self.stats["hits"] + self.stats["misses"]
+        if not lookups:
+            return 0.0
+        return (self.stats["gateway_hits"] + self.stats["hits"]) / lookups
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "size": len(self._users), "dm_size": len(self._dm_channels),
+                "hit_rate": self.hit_rate()}
@@ -4,10 +4,10 @@ from bs4 import BeautifulSoup
 import json
 import os
 from datetime import datetime
-import re
 from typing import Dict, List, Optional
 import logging
 from urllib.parse import urljoin
+from .regex_bank import WEB_PATTERNS
 
 class WebDataCollector:
     def __init__(self):
@@ -31,14 +31,8 @@ class WebDataCollector:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        # Các pattern để trích xuất thông tin
-        self.patterns = {
-            'price': r'(\d+[.,]?\d*)\s*(GJN|USD|EUR|₽|VND|₫)',
-            'vehicle_name': r'([A-Z][A-Za-z0-9-_]+(?:\s+[A-Za-z0-9-_]+)*)',
-            'br_rating': r'BR\s*(\d+\.\d+|\d+)',
-            'repair_cost': r'Repair cost:?\s*(\d+[.,]?\d*)',
-            'modification': r'Modification cost:?\s*(\d+[.,]?\d*)'
-        }
+        # Các pattern để trích xuất thông tin (đã biên dịch sẵn trong regex_bank)
+        self.patterns = WEB_PATTERNS
         
         # Khởi tạo logger
         self.setup_logger()
@@ -122,16 +116,16 @@ class WebDataCollector:
                         vehicle_data['name'] = title.text.strip()
                     
                     # Tìm BR rating
-                    br_text = soup.find(text=re.compile(r'BR\s*\d'))
+                    br_text = soup.find(text=self.patterns['br_text'])
                     if br_text:
-                        br_match = re.search(self.patterns['br_rating'], br_text)
+                        br_match = self.patterns['br_rating'].search(br_text)
                         if br_match:
                             vehicle_data['br_rating'] = float(br_match.group(1))
                     
                     # Tìm repair cost
-                    repair_text = soup.find(text=re.compile(r'Repair cost'))
+                    repair_text = soup.find(text=self.patterns['repair_text'])
                     if repair_text:
-                        repair_match = re.search(self.patterns['repair_cost'], repair_text)
+                        repair_match = self.patterns['repair_cost'].search(repair_text)
                         if repair_match:
                             vehicle_data['repair_cost'] = int(repair_match.group(1).replace(',', ''))
                     
@@ -142,9 +136,9 @@ class WebDataCollector:
                             'name': mod.find(class_='mod-name').text.strip() if mod.find(class_='mod-name') else None,
                             'cost': None
                         }
-                        cost_text = mod.find(text=re.compile(r'cost:?\s*\d'))
+                        cost_text = mod.find(text=self.patterns['cost_text'])
                         if cost_text:
-                            cost_match = re.search(self.patterns['modification'], cost_text)
+                            cost_match = self.patterns['modification'].search(cost_text)
                             if cost_match:
                                 mod_data['cost'] = int(cost_match.group(1).replace(',', ''))
                         vehicle_data['modifications'].append(mod_data)
@@ -178,9 +172,9 @@ class WebDataCollector:
                         }
                         
                         # Tìm giá
-                        price_text = item.find(text=re.compile(self.patterns['price']))
+                        price_text = item.find(text=self.patterns['price'])
                         if price_text:
-                            price_match = re.search(self.patterns['price'], price_text)
+                            price_match = self.patterns['price'].search(price_text)
                             if price_match:
                                 item_data['price'] = float(price_match.group(1))
                                 item_data['currency'] = price_match.group(2)